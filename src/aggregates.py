@@ -0,0 +1,244 @@
+# This file contains the aggregate cube used by the graphs of the Dash application.
+# The observations are counted once, at the start of the application, for every combination of the filter box dimensions
+# (shape, duration class, decade) and of the dimensions of the graphs (month, hour, day, city, duration, sentiment).
+# Any selection of the filter box is then answered by summing the counts of the selected cells, without going through the rows.
+# Only the text-based views (word frequency) still need the row-level data.
+
+import base64
+
+import numpy as np
+import pandas as pd
+
+import data_access
+
+# Duration (in seconds) of a representative observation of each duration class, see data_access.filter_by_duration
+DURATION_CLASS_SECONDS = {"short": 0, "long": 60}
+
+# Fixed bins of the duration histogram, in log2 of the duration in seconds: DURATION_BINS bins of DURATION_BIN_WIDTH from 1 second
+# (2 ** 30 seconds, about 34 years, for the last bin, which also holds the longer durations)
+DURATION_BIN_WIDTH = 0.5
+DURATION_BINS = 60
+
+# Sizes (in degrees) of the square grids in which the observations are grouped for the coarser levels of detail of the map
+MAP_GRID_SIZES = [0.25, 0.5, 1, 2]
+
+
+def duration_bins(durations: pd.Series) -> pd.Series:
+    """
+    This function returns the bin of the duration histogram of each duration (durations under 1 second are in the first bin).
+    """
+    log_durations = np.log2(durations.clip(lower=1))
+    return (log_durations // DURATION_BIN_WIDTH).clip(upper=DURATION_BINS - 1).astype(np.int64).rename("duration_bin")
+
+
+def cube_dimensions(df: pd.DataFrame) -> dict:
+    """
+    This function returns the key columns of each dimension of the graphs, named like in the restructure_df functions of the components.
+    The city dimension is not grouped: its keys are the city ids of the preprocessing (see AggregateCube).
+
+    Besides the cities, the map has coarser levels of detail: the square grids of MAP_GRID_SIZES (keyed by the center of the grid cell)
+    and the states (keyed by the average location of their observations).
+    """
+    grid_dimensions = {
+        f"grid_{size}": [
+            ((np.floor(df["city_longitude"] / size) + 0.5) * size).rename("longitude"),
+            ((np.floor(df["city_latitude"] / size) + 0.5) * size).rename("latitude"),
+        ]
+        for size in MAP_GRID_SIZES
+    }
+    states = df.groupby("state", observed=True)
+
+    return {
+        "month": [df["date_time"].dt.to_period("M").rename("date_time")],
+        "hour": [df["date_time"].dt.hour.rename("hour")],
+        "day": [df["date_time"].dt.year.rename("year"), df["date_time"].dt.day_of_year.rename("day")],
+        **grid_dimensions,
+        "state": [
+            states["city_longitude"].transform("mean").rename("longitude"),
+            states["city_latitude"].transform("mean").rename("latitude"),
+            df["state"],
+        ],
+        "duration": [duration_bins(df["duration"])],
+        "sentiment": [df["sentiment"]],
+    }
+
+
+class AggregateCube:
+    """
+    This class holds the number of observations of each filter cell (shape x duration class x decade) for each value of the graph dimensions.
+
+    For each dimension, the non-zero counts are stored as three aligned arrays (cell, key, count) and the distinct keys in a DataFrame.
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        years = df["date_time"].dt.year
+        long_durations = df["duration"] >= 60
+
+        # Filter cells: one per combination of shape, duration class and decade (missing dates have their own decade)
+        cell_groups = df.groupby(
+            [df["shape"].astype("category"), long_durations.rename("long"), (years // 10 * 10).rename("decade")],
+            observed=True,
+            dropna=False,
+        )
+        cell_codes = cell_groups.ngroup().to_numpy()
+
+        # Each cell is represented by one observation of the cell, so that the masks of data_access.build_filter_index apply to the cells
+        cells = cell_groups.size().index.to_frame(index=False)
+        self.cells = pd.DataFrame(
+            {
+                "shape": cells["shape"],
+                "duration": np.where(cells["long"], DURATION_CLASS_SECONDS["long"], DURATION_CLASS_SECONDS["short"]),
+                "date_time": pd.to_datetime(cells["decade"].astype("Int64").astype(str), format="%Y", errors="coerce"),
+            }
+        )
+        self.filter_index = data_access.build_filter_index(self.cells)
+
+        self.keys = {}
+        self.counts = {}
+        for dimension, key_columns in cube_dimensions(df).items():
+            # Same groups (and same order) as the groupby of the components, rows with a missing key are dropped
+            key_groups = df.groupby(key_columns, observed=True)
+            key_codes = key_groups.ngroup().fillna(-1).to_numpy(dtype=np.int64)
+            self.add_dimension(dimension, cell_codes, key_codes, key_groups.size().index.to_frame(index=False))
+
+        # The city ids are already dense codes, in the order of the cities: the keys are the rows of the city dimension table
+        cities = data_access.city_table(df)[["city_longitude", "city_latitude", "city"]].reset_index(drop=True)
+        self.add_dimension("city", cell_codes, df["city_id"].to_numpy(dtype=np.int64), cities)
+
+        # Dense matrices of the dimensions counted as a grid: years x days of the year for the heatmap
+        self.matrices = {"day": matrix_layout(self.keys["day"], "year", "day")}
+
+    def add_dimension(self, dimension: str, cell_codes: np.ndarray, key_codes: np.ndarray, keys: pd.DataFrame):
+        """
+        This method counts the observations of each (cell, key) pair of the dimension, from the cell and key code of each observation
+        (-1 for a missing key).
+        """
+        n_keys = len(keys)
+        valid = key_codes >= 0
+        cell_keys, counts = np.unique(cell_codes[valid] * n_keys + key_codes[valid], return_counts=True)
+
+        self.keys[dimension] = keys
+        self.counts[dimension] = (cell_keys // n_keys, cell_keys % n_keys, counts)
+
+    def to_store(self) -> dict:
+        """
+        This method returns the cube (JSON serializable), to be sent once to the browser in a dcc.Store.
+
+        The cells are described by their shape, duration class (long = 1) and decade (0 for the missing dates),
+        and each dimension by its key columns and its aligned cell, key and count arrays.
+        The numeric arrays are typed arrays (see store_array), decoded by the browser (see loadCube and decodeColumns in assets/clientside_filtering.js).
+        """
+        decades = self.cells["date_time"].dt.year.fillna(0).astype(int)
+        store = {
+            "cells": {
+                "shape": self.cells["shape"].astype(str).tolist(),
+                "long": store_array(self.cells["duration"] >= DURATION_CLASS_SECONDS["long"]),
+                "decade": store_array(decades),
+            },
+            "dimensions": {},
+        }
+
+        for dimension, keys in self.keys.items():
+            cells, key_codes, counts = self.counts[dimension]
+            store["dimensions"][dimension] = {
+                "keys": {column: store_values(keys[column]) for column in keys.columns},
+                "cell": store_array(cells),
+                "key": store_array(key_codes),
+                "count": store_array(counts),
+            }
+
+        return store
+
+    def slice(self, shapes: list[str], duration: str = "all", decade: str = "Toutes") -> "CubeSlice":
+        """
+        This method returns the slice of the cube selected by the values of the filter box.
+        """
+        cells_mask = data_access.filter_mask(self.filter_index, shapes, duration, decade)
+        return CubeSlice(self, cells_mask)
+
+
+class CubeSlice:
+    """
+    This class represents the observations of the selected filter cells of an AggregateCube, which are counted on demand.
+    """
+
+    def __init__(self, cube: AggregateCube, cells_mask: np.ndarray):
+        self.cube = cube
+        self.cells_mask = cells_mask
+
+    def count_by(self, dimension: str) -> pd.DataFrame:
+        """
+        This method returns the number of selected observations ("count" column) for each key of the dimension,
+        like df.groupby(keys).size().reset_index(name="count") on the selected rows.
+        """
+        keys = self.cube.keys[dimension]
+        cells, key_codes, counts = self.cube.counts[dimension]
+
+        selected = self.cells_mask[cells]
+        totals = np.bincount(key_codes[selected], weights=counts[selected], minlength=len(keys)).astype(np.int64)
+        non_zero = totals > 0
+
+        counts_df = keys[non_zero].reset_index(drop=True)
+        counts_df["count"] = totals[non_zero]
+        return counts_df
+
+    def count_matrix(self, dimension: str) -> pd.DataFrame:
+        """
+        This method returns the number of selected observations of a two-column dimension as a dense matrix (see matrix_layout),
+        with a row per value of the first column and a column per value of the second column (0 without observation),
+        like count_by(dimension) pivoted and filled with 0.
+        """
+        row_values, column_values, positions = self.cube.matrices[dimension]
+        cells, key_codes, counts = self.cube.counts[dimension]
+
+        # A single bincount over the precomputed position of each (cell, key) pair in the flattened matrix
+        selected = self.cells_mask[cells]
+        totals = np.bincount(positions[key_codes[selected]], weights=counts[selected], minlength=len(row_values) * len(column_values))
+
+        matrix = totals.astype(np.int64).reshape(len(row_values), len(column_values))
+        return pd.DataFrame(matrix, index=row_values, columns=column_values)
+
+
+def matrix_layout(keys: pd.DataFrame, row_column: str, column_column: str) -> tuple:
+    """
+    This function returns the rows and columns of the dense matrix of a two-column dimension (every integer between the minimum and
+    the maximum of each column) and the position of each key in the flattened matrix.
+    """
+    row_values = np.arange(int(keys[row_column].min()), int(keys[row_column].max()) + 1)
+    column_values = np.arange(int(keys[column_column].min()), int(keys[column_column].max()) + 1)
+
+    positions = (keys[row_column].to_numpy() - row_values[0]) * len(column_values) + (keys[column_column].to_numpy() - column_values[0])
+    return row_values, column_values, positions.astype(np.int64)
+
+
+def store_values(values: pd.Series):
+    """
+    This function converts the values of a key column for the store: a list of strings for the periods and the categories,
+    and a typed array for the numbers (integers for the whole numbers, e.g. years, and 32-bit floats for the coordinates).
+    """
+    if isinstance(values.dtype, (pd.PeriodDtype, pd.CategoricalDtype)) or values.dtype == object:
+        return values.astype(str).tolist()
+
+    if values.dtype.kind == "f" and not (values == values.round()).all():
+        return store_array(values.astype(np.float32))
+
+    return store_array(values.astype(np.int64))
+
+
+def store_array(values) -> dict:
+    """
+    This function encodes a numeric array as a typed array: the base64 of its little-endian bytes and its type, the smallest unsigned
+    integer type that holds its values ("u1", "u2", "u4"), "i4" for negative integers, or "f4" for floats.
+    """
+    values = np.asarray(values)
+
+    if values.dtype.kind == "f":
+        dtype = "f4"
+    elif len(values) and values.min() < 0:
+        dtype = "i4"
+    else:
+        maximum = values.max() if len(values) else 0
+        dtype = "u1" if maximum < 2**8 else "u2" if maximum < 2**16 else "u4"
+
+    data = values.astype(f"<{dtype}").tobytes()
+    return {"dtype": dtype, "bdata": base64.b64encode(data).decode("ascii")}
@@ -4,14 +4,26 @@
 # Authors: Simon Haché, Julien Milosz, Manel Keddam
 # Course: INF8808
 
-from dash import Dash, html, dcc, callback, Output, Input
+from dash import Dash, html, dcc, callback, Output, Input, State, ClientsideFunction
 from dash_bootstrap_templates import load_figure_template
 import dash_bootstrap_components as dbc
-from components.filter_box import filter_box_layout
-import preprocess
+from components.filter_box import filter_box_layout, DEFAULT_SHAPES, DEFAULT_DURATION, DEFAULT_DECADE
+import data_access
+import aggregates
+import token_index
+import figure_cache
+import figure_patch
+import prebuilt_figures
 import plotly.graph_objects as go
+import gzip
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from flask import request, Response
 
-from components.map import draw_map
+from components.map import draw_map, compact_map_figure
 from components.cultural_events import draw_cultural_events_graph
 from components.density_by_hour import draw_density_by_hour_graph
 from components.duration import draw_duration_graph
@@ -25,15 +37,41 @@ from components.word_frequency import draw_word_frequency_graph
 # If RUN_PREPROCESS is set to True, the raw data will be preprocessed and saved to a CSV file
 # This operation can take a few minutes, therefore it is recommended to set it to False after the first run
 # The saved preprocessed data (CSV file) and will be loaded for more efficient use in the application.
+# The preprocess module (and the NLP libraries it uses) is only imported in that case, to keep the workers startup fast.
 RUN_PREPROCESS = False
 
 if RUN_PREPROCESS:
+    import preprocess
+
     raw_data = preprocess.load_raw_data()
     data = preprocess.preprocess(raw_data)
 else:
-    data = preprocess.load_data()
+    data = data_access.load_data()
+
+events_db = data_access.load_events()
+
+# If CLIENTSIDE_FILTERING is set to True, the aggregate cube is sent once to the browser, which filters the graphs itself
+# (assets/clientside_filtering.js). The server only draws the figures of each decade (and of the geo toggle), and the word frequency.
+CLIENTSIDE_FILTERING = False
+
+# Masks of the filter box values, computed once so that the callbacks only combine them
+filter_index = data_access.build_filter_index(data)
+
+# Counts of the observations for every combination of the filter box, used by all the graphs except the word frequency
+cube = aggregates.AggregateCube(data)
 
-events_db = preprocess.load_events()
+# Word ids and counts of each summary, used by the word frequency
+tokens = token_index.load_token_index(data)
+
+# Cache of the rendered figures, bounded by the total size of the serialized figures (in bytes)
+# If the FIGURE_CACHE_DIR environment variable is set, the figures are also shared with the other workers through that directory
+# The figures are versioned by the fingerprint of the code and of the processed data, so that a deploy never reads the figures of the previous one
+FIGURE_CACHE_MAX_BYTES = 64 * 1024 * 1024
+figures_cache = figure_cache.FigureCache(
+    FIGURE_CACHE_MAX_BYTES,
+    disk_dir=os.environ.get("FIGURE_CACHE_DIR"),
+    version=prebuilt_figures.sources_fingerprint(),
+)
 
 # Dash application setup
 app = Dash(__name__, title="OVNI", external_stylesheets=[dbc.themes.LUX])
@@ -41,6 +79,113 @@ server = app.server
 app._favicon = "images/ufo.png"
 load_figure_template("LUX")
 
+# Number of filter selections (selected rows and slice of the cube) kept by each worker
+SELECTION_CACHE_SIZE = 16
+
+# If FIGURE_BUILD_THREADS is above 1, the figures of update_graphs are drawn concurrently by a pool of threads of each worker
+# (pandas and numpy release the GIL in part of their work). The threads are only started by the first callback, after gunicorn forks the workers.
+FIGURE_BUILD_THREADS = 1
+figure_pool = ThreadPoolExecutor(max_workers=FIGURE_BUILD_THREADS) if FIGURE_BUILD_THREADS > 1 else None
+
+# The figures drawn concurrently wait for the first one to compute the selection, instead of computing it each
+selection_lock = threading.Lock()
+
+
+@lru_cache(maxsize=SELECTION_CACHE_SIZE)
+def select_observations(filters: tuple) -> tuple:
+    """
+    This function returns the mask of the rows (for the word frequency) and the slice of the cube (for the other graphs) selected by the filters.
+
+    The selections are kept by filters, so that the callbacks depending on the same filter box state compute it only once.
+    """
+    shape_filters, duration_filter, decade_filter = filters
+    mask = data_access.filter_mask(filter_index, list(shape_filters), duration_filter, decade_filter)
+    cube_slice = cube.slice(list(shape_filters), duration_filter, decade_filter)
+    return mask, cube_slice
+
+
+def selection_filters(selection: list) -> tuple:
+    """
+    This function converts the filters of the selection store (lists once serialized to JSON) back to hashable filters.
+    """
+    shape_filters, duration_filter, decade_filter = selection
+    return (tuple(shape_filters), duration_filter, decade_filter)
+
+
+def cached_figure(key, draw_figure, filters: tuple) -> dict:
+    """
+    This function returns the figure from the figure cache, or draws it from the selection of the filters and caches it.
+    """
+    figure = figures_cache.get(key)
+
+    if figure is None:
+        # The selection is only computed when the figure is missing from the cache
+        with selection_lock:
+            mask, cube_slice = select_observations(filters)
+        # Some figures are drawn directly as dicts (see COMPACT_MAP_PAYLOAD)
+        figure = draw_figure(mask, cube_slice)
+        figure = figure if isinstance(figure, dict) else figure.to_dict()
+        # The key is kept in the figure, so that the callbacks know which figure each graph displays (see figure_update)
+        figure["layout"]["meta"] = key
+        figure = figures_cache.put(key, figure)
+
+    return figure
+
+
+def figure_update(figure: dict, displayed_key: list):
+    """
+    This function returns the update of a graph to the figure: a Patch of the changes since the figure displayed by the graph
+    (whose key is sent back by the browser), or the full figure when the displayed figure is not in the figure cache.
+    """
+    if displayed_key is None:
+        return figure
+
+    # Both keys are serialized to JSON (lists)
+    if displayed_key == figure["layout"]["meta"]:
+        return figure_patch.no_update
+
+    name, displayed_filters, *options = displayed_key
+    previous = figures_cache.get((name, selection_filters(displayed_filters), *options))
+    return figure_patch.figure_update(previous, figure)
+
+
+# Functions drawing each graph of update_graphs, from the selected rows (word frequency) or from the selected slice of the cube
+FIGURE_BUILDERS = {
+    "word_frequency": lambda mask, cube_slice: draw_word_frequency_graph(tokens, mask),
+    "sentiment": lambda mask, cube_slice: draw_sentiment_analysis_graph(cube_slice),
+    "density_month": lambda mask, cube_slice: draw_heatmap_graph(cube_slice),
+    "density_hour": lambda mask, cube_slice: draw_density_by_hour_graph(cube_slice),
+    "duration": lambda mask, cube_slice: draw_duration_graph(cube_slice),
+    "events": lambda mask, cube_slice: draw_cultural_events_graph(cube_slice, events_db),
+}
+
+
+# If COMPACT_MAP_PAYLOAD is set to True, the numeric arrays of the map (coordinates, counts and sizes) are sent as binary typed arrays,
+# which plotly.js decodes, instead of JSON numbers (see components/map.py, compact_map_figure). It requires plotly.js >= 2.28 (plotly >= 5.19).
+# The figure is smaller and faster to parse, but compresses less well: the responses of the prebuilt store (gzip and brotli) are about 15% larger.
+COMPACT_MAP_PAYLOAD = True
+
+
+def map_figure(filters: tuple, geo_toggle_value: bool):
+    """
+    This function returns the map of the observations selected by the filters, which also depends on the geo toggle.
+    """
+    if COMPACT_MAP_PAYLOAD:
+        draw_figure = lambda mask, cube_slice: compact_map_figure(draw_map(cube_slice, geo_toggle_value))
+    else:
+        draw_figure = lambda mask, cube_slice: draw_map(cube_slice, geo_toggle_value)
+    return cached_figure(("map", filters, geo_toggle_value), draw_figure, filters)
+
+
+# Figures of the default state of the filter box, drawn once for the initial layout (and kept in the figure cache)
+# The callbacks are not called on the first page load, since they would return these same figures
+DEFAULT_FILTERS = figure_cache.normalize_filters(DEFAULT_SHAPES, DEFAULT_DURATION, DEFAULT_DECADE)
+initial_figures = {
+    name: cached_figure((name, DEFAULT_FILTERS), draw_figure, DEFAULT_FILTERS)
+    for name, draw_figure in FIGURE_BUILDERS.items()
+}
+initial_figures["map"] = map_figure(DEFAULT_FILTERS, False)
+
 # HTML Layout
 header = dbc.Container(
     [
@@ -87,7 +232,7 @@ body = dbc.Container(
                                 },
                             ),
                             dcc.Graph(
-                                figure=draw_map(data, False),
+                                figure=initial_figures["map"],
                                 id="map",
                                 style={
                                     "height": "600px",
@@ -114,7 +259,7 @@ body = dbc.Container(
                         ),
                         dbc.Container(
                             dcc.Graph(
-                                figure=draw_word_frequency_graph(data),
+                                figure=initial_figures["word_frequency"],
                                 id="word_frequency",
                                 style={"height": "100%"},
                             ),
@@ -127,7 +272,7 @@ body = dbc.Container(
                         html.P("Analyse de Sentiment", className="graph-title"),
                         dbc.Container(
                             dcc.Graph(
-                                figure=draw_sentiment_analysis_graph(data),
+                                figure=initial_figures["sentiment"],
                                 id="sentiment",
                                 style={"height": "100%"},
                             ),
@@ -146,7 +291,7 @@ body = dbc.Container(
                     ),
                     dbc.Container(
                         dcc.Graph(
-                            figure=draw_heatmap_graph(data),
+                            figure=initial_figures["density_month"],
                             id="density_month",
                             style={"width": "100%"},
                         ),
@@ -164,7 +309,7 @@ body = dbc.Container(
                     ),
                     dbc.Container(
                         dcc.Graph(
-                            figure=draw_density_by_hour_graph(data),
+                            figure=initial_figures["density_hour"],
                             id="density_hour",
                             style={"height": "100%"},
                         ),
@@ -179,7 +324,7 @@ body = dbc.Container(
                     html.P("Durée des observations", className="graph-title"),
                     dbc.Container(
                         dcc.Graph(
-                            figure=draw_duration_graph(data),
+                            figure=initial_figures["duration"],
                             id="duration",
                             style={"height": "100%"},
                         ),
@@ -197,7 +342,7 @@ body = dbc.Container(
                     ),
                     dbc.Container(
                         dcc.Graph(
-                            figure=draw_cultural_events_graph(data, events_db),
+                            figure=initial_figures["events"],
                             id="events",
                             style={"height": "100%"},
                         ),
@@ -241,7 +386,8 @@ footer = dbc.Container(
         # Explication rapide des transformations effectuées pour chaque graphique
         html.P("Les visualisations présentées dans cette application sont les suivantes:"),
         html.Ol([
-            html.Li("Carte des États-Unis: Les observations sont regroupées par ville et affichées sur une carte des États-Unis et les premières 1500 villes sont affichées.\
+            html.Li("Carte des États-Unis: Les observations sont regroupées par ville et affichées sur une carte des États-Unis. Lorsque plus de 1500 villes sont sélectionnées, \
+                elles sont regroupées par zone (grille de 0.25° à 2°) ou par état, afin que toutes les observations restent représentées.\
                 Les reliefs peuvent être affichés pour une meilleure visualisation."),
             html.Li("Top 10 Mots Fréquemment Utilisés: Les mots les plus fréquemment utilisés dans les résumés d'observations sont affichés sans les mots vides et la ponctuation."),
             html.Li("Analyse de Sentiment: La polarité sentimentale des résumés d'observations est calculée et affichée sous forme de barplot en trois catégories: positif, neutre et négatif. \
@@ -256,52 +402,181 @@ footer = dbc.Container(
     style={"textAlign": "left", "margin": "40px"},
 )
 
-app.layout = dbc.Container([header, filter_box, body, footer])
+# The store holds the normalized state of the filter box, shared by the callbacks of the graphs
+selection_store = dcc.Store(id="selection", data=DEFAULT_FILTERS)
+stores = [selection_store]
+
+# Graphs updated by the callbacks of update_graphs and update_map
+GRAPHS = ["map", *FIGURE_BUILDERS]
+
+# Graphs filtered in the browser in the CLIENTSIDE_FILTERING mode, with the dimension of the cube they count
+CLIENTSIDE_GRAPHS = ["map", "sentiment", "density_month", "density_hour", "duration", "events"]
 
+# Route of the cube in the CLIENTSIDE_FILTERING mode, versioned like the figure cache so that the browsers can cache it
+CUBE_STORE_URL = f"/cube-store/{figures_cache.version[:16]}.json"
 
-@app.callback(
-    Output("map", "figure"),
-    Output("word_frequency", "figure"),
-    Output("sentiment", "figure"),
-    Output("density_month", "figure"),
-    Output("density_hour", "figure"),
-    Output("duration", "figure"),
-    Output("events", "figure"),
+if CLIENTSIDE_FILTERING:
+    # The cube is fetched once by the browser from CUBE_STORE_URL (see cube_store), and the figures of the selected decade
+    # drawn by the server (for all shapes and durations) are kept in stores
+    stores.append(dcc.Store(id="cube_url", data=CUBE_STORE_URL))
+    stores += [dcc.Store(id=f"base_{name}", data=initial_figures[name]) for name in CLIENTSIDE_GRAPHS]
+else:
+    # Keys of the figures displayed by the graphs, from which the callbacks send partial updates (see figure_update)
+    stores.append(dcc.Store(id="displayed_figures", data=[initial_figures[name]["layout"]["meta"] for name in GRAPHS]))
+
+app.layout = dbc.Container([header, filter_box, *stores, body, footer])
+
+
+# Responses of the figure callbacks prebuilt at deploy time (python prebuilt_figures.py), used when they are up to date
+prebuilt_store = prebuilt_figures.PrebuiltStore()
+
+
+@server.before_request
+def serve_prebuilt_figures():
+    # Answer the figure callbacks with the precompressed prebuilt responses, otherwise (None) Dash calls the callback
+    if request.path != "/_dash-update-component" or not prebuilt_store.responses:
+        return None
+
+    body = request.get_json(silent=True) or {}
+    input_values = [item.get("value") for item in body.get("inputs", [])]
+    return prebuilt_store.response(body.get("output"), input_values, request.accept_encodings)
+
+
+if CLIENTSIDE_FILTERING:
+    # The cube is serialized and compressed once, instead of being inlined in the layout of every page load
+    cube_store_json = json.dumps(cube.to_store(), separators=(",", ":")).encode("utf-8")
+    cube_store_gzip = gzip.compress(cube_store_json, compresslevel=9, mtime=0)
+
+    @server.route(CUBE_STORE_URL)
+    def cube_store():
+        # The URL changes with the version of the code and of the data, so the response never changes
+        headers = {"Cache-Control": "public, max-age=31536000, immutable", "Vary": "Accept-Encoding"}
+        if "gzip" in request.accept_encodings:
+            headers["Content-Encoding"] = "gzip"
+            return Response(cube_store_gzip, mimetype="application/json", headers=headers)
+        return Response(cube_store_json, mimetype="application/json", headers=headers)
+
+
+@server.route("/figure-cache")
+def figure_cache_stats():
+    # Hit, miss and eviction counters of the figure cache of this worker
+    return figures_cache.stats()
+
+
+# Normalized state of the filter box (same as figure_cache.normalize_filters), computed in the browser
+# so that a filter change sends the figure requests directly, without a round trip to the server first
+app.clientside_callback(
+    """
+    function(shapeFilters, durationFilter, decadeFilter) {
+        return [[...(shapeFilters || [])].sort(), durationFilter, decadeFilter];
+    }
+    """,
+    Output("selection", "data"),
     Input("shape_filter", "value"),
     Input("duration_filter", "value"),
     Input("decade_filter", "value"),
-    Input("geo_toggler", "value"),
+    prevent_initial_call=True,
 )
-def update_graphs(
-    shape_filters: list[str],
-    duration_filter: str,
-    decade_filter: str,
-    geo_toggle_value: bool,
-):
-    filtered_data = data.copy(deep=True)
-
-    filtered_data = preprocess.filter_by_shapes(filtered_data, shape_filters)
-    filtered_data = preprocess.filter_by_duration(filtered_data, duration_filter)
-    filtered_data = preprocess.filter_by_decade(filtered_data, decade_filter)
-
-    map = draw_map(filtered_data, geo_toggle_value)
-    word_frequency = draw_word_frequency_graph(filtered_data)
-    sentiment = draw_sentiment_analysis_graph(filtered_data)
-    density_month = draw_heatmap_graph(filtered_data)
-    density_hour = draw_density_by_hour_graph(filtered_data)
-    duration = draw_duration_graph(filtered_data)
-    events = draw_cultural_events_graph(filtered_data, events_db)
-
-    return (
-        map,
-        word_frequency,
-        sentiment,
-        density_month,
-        density_hour,
-        duration,
-        events,
+
+
+if not CLIENTSIDE_FILTERING:
+
+    @app.callback(
+        Output("word_frequency", "figure"),
+        Output("sentiment", "figure"),
+        Output("density_month", "figure"),
+        Output("density_hour", "figure"),
+        Output("duration", "figure"),
+        Output("events", "figure"),
+        Input("selection", "data"),
+        State("displayed_figures", "data"),
+        prevent_initial_call=True,
     )
+    def update_graphs(selection: list, displayed_keys: list = None):
+        filters = selection_filters(selection)
+        displayed_keys = dict(zip(GRAPHS, displayed_keys or []))
 
+        def draw(name: str) -> dict:
+            return cached_figure((name, filters), FIGURE_BUILDERS[name], filters)
+
+        # The figures are gathered in the order of the outputs
+        if figure_pool is None:
+            figures = [draw(name) for name in FIGURE_BUILDERS]
+        else:
+            figures = list(figure_pool.map(draw, FIGURE_BUILDERS))
+
+        return tuple(figure_update(figure, displayed_keys.get(name)) for name, figure in zip(FIGURE_BUILDERS, figures))
+
+    @app.callback(
+        Output("map", "figure"),
+        Input("selection", "data"),
+        Input("geo_toggler", "value"),
+        State("displayed_figures", "data"),
+        prevent_initial_call=True,
+    )
+    def update_map(selection: list, geo_toggle_value: bool, displayed_keys: list = None):
+        # Only the map depends on the geo toggle
+        displayed_keys = dict(zip(GRAPHS, displayed_keys or []))
+        return figure_update(map_figure(selection_filters(selection), geo_toggle_value), displayed_keys.get("map"))
+
+    # The browser sends back the key of the figure displayed by each graph, once the full figure or the Patch is applied
+    app.clientside_callback(
+        """
+        function(...figures) {
+            return figures.map((figure) => (figure && figure.layout ? figure.layout.meta : null));
+        }
+        """,
+        Output("displayed_figures", "data"),
+        [Input(name, "figure") for name in GRAPHS],
+        prevent_initial_call=True,
+    )
+
+else:
+
+    @app.callback(
+        Output("word_frequency", "figure"),
+        Input("selection", "data"),
+        prevent_initial_call=True,
+    )
+    def update_word_frequency(selection: list):
+        # The word frequency is the only graph that needs the selected rows
+        filters = selection_filters(selection)
+        return cached_figure(("word_frequency", filters), FIGURE_BUILDERS["word_frequency"], filters)
+
+    @app.callback(
+        [Output(f"base_{name}", "data") for name in CLIENTSIDE_GRAPHS if name != "map"],
+        Input("decade_filter", "value"),
+        prevent_initial_call=True,
+    )
+    def update_base_figures(decade_filter: str):
+        # Figures of the decade for all shapes and durations, whose data is replaced in the browser
+        filters = figure_cache.normalize_filters(DEFAULT_SHAPES, DEFAULT_DURATION, decade_filter)
+        return tuple(
+            cached_figure((name, filters), FIGURE_BUILDERS[name], filters)
+            for name in CLIENTSIDE_GRAPHS
+            if name != "map"
+        )
+
+    @app.callback(
+        Output("base_map", "data"),
+        Input("decade_filter", "value"),
+        Input("geo_toggler", "value"),
+        prevent_initial_call=True,
+    )
+    def update_base_map(decade_filter: str, geo_toggle_value: bool):
+        filters = figure_cache.normalize_filters(DEFAULT_SHAPES, DEFAULT_DURATION, decade_filter)
+        return map_figure(filters, geo_toggle_value)
+
+    app.clientside_callback(
+        ClientsideFunction(namespace="filtering", function_name="filter_figures"),
+        [Output(name, "figure") for name in CLIENTSIDE_GRAPHS],
+        Input("shape_filter", "value"),
+        Input("duration_filter", "value"),
+        Input("decade_filter", "value"),
+        [Input(f"base_{name}", "data") for name in CLIENTSIDE_GRAPHS],
+        State("cube_url", "data"),
+        prevent_initial_call=True,
+    )
 
 if __name__ == "__main__":
     app.run(debug=True)
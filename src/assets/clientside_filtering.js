@@ -0,0 +1,242 @@
+// This file contains the clientside callbacks of the optional browser-side filtering mode (CLIENTSIDE_FILTERING in app.py).
+// The aggregate cube is fetched once by the browser (from the URL of the dcc.Store "cube_url", see cube_store in app.py). When the filters
+// change, the observations of the selected cells are counted again in the browser and the data of the figures drawn by the server
+// for the decade (base figures) is replaced.
+
+// Maximum number of markers, levels of detail (from the finest) and largest marker area of the map, see components/map.py
+const MAX_MARKERS = 1500;
+const MAP_LEVELS = ["city", "grid_0.25", "grid_0.5", "grid_1", "grid_2", "state"];
+const MAX_MARKER_AREA = 600;
+
+// Types of the typed arrays of the cube, see aggregates.store_array
+const TYPED_ARRAYS = { u1: Uint8Array, u2: Uint16Array, u4: Uint32Array, i4: Int32Array, f4: Float32Array };
+
+function decodeArray(values) {
+    if (!values || typeof values.bdata !== "string") {
+        return values;
+    }
+    const bytes = Uint8Array.from(atob(values.bdata), (character) => character.charCodeAt(0));
+    return new TYPED_ARRAYS[values.dtype](bytes.buffer);
+}
+
+function decodeColumns(columns) {
+    return Object.fromEntries(Object.entries(columns).map(([name, values]) => [name, decodeArray(values)]));
+}
+
+// The cube is fetched and decoded once, and fetched again after a failure
+let cubePromise = null;
+
+function loadCube(url) {
+    if (cubePromise === null) {
+        cubePromise = fetch(url)
+            .then((response) => response.json())
+            .then((store) => ({
+                cells: decodeColumns(store.cells),
+                dimensions: Object.fromEntries(
+                    Object.entries(store.dimensions).map(([dimension, { keys, ...arrays }]) => [
+                        dimension,
+                        { keys: decodeColumns(keys), ...decodeColumns(arrays) },
+                    ])
+                ),
+            }))
+            .catch((error) => {
+                cubePromise = null;
+                throw error;
+            });
+    }
+    return cubePromise;
+}
+
+// Same rules as data_access.filter_mask, applied to the cells of the cube (decade 0 for the missing dates)
+function selectCells(cells, shapes, duration, decade) {
+    return cells.shape.map((shape, i) => {
+        if (shapes && shapes.length && !shapes.includes(shape)) {
+            return false;
+        }
+        if ((duration === "short" && cells.long[i]) || (duration === "long" && !cells.long[i])) {
+            return false;
+        }
+        if (decade === "Toutes") {
+            return true;
+        }
+        const cellDecade = cells.decade[i];
+        if (cellDecade === 0) {
+            return false;
+        }
+        return decade === "Pre-1980" ? cellDecade < 1980 : cellDecade === parseInt(decade);
+    });
+}
+
+// Same as CubeSlice.count_by: the keys (in the order of the cube) with a non-zero number of selected observations
+function countBy(cube, dimension, selectedCells) {
+    const { keys, cell, key, count } = cube.dimensions[dimension];
+    const columns = Object.keys(keys);
+    const totals = new Array(keys[columns[0]].length).fill(0);
+
+    for (let i = 0; i < cell.length; i++) {
+        if (selectedCells[cell[i]]) {
+            totals[key[i]] += count[i];
+        }
+    }
+
+    const counts = { count: [] };
+    columns.forEach((column) => (counts[column] = []));
+    totals.forEach((total, index) => {
+        if (total > 0) {
+            columns.forEach((column) => counts[column].push(keys[column][index]));
+            counts.count.push(total);
+        }
+    });
+    return counts;
+}
+
+// Same as restructure_df of components/map.py: the areas of the finest level of detail with at most MAX_MARKERS areas
+function mapAreas(cube, selectedCells) {
+    let level;
+    let counts;
+    for (level of MAP_LEVELS) {
+        counts = countBy(cube, level, selectedCells);
+        if (counts.count.length <= MAX_MARKERS) {
+            break;
+        }
+    }
+
+    if (level === "city") {
+        return { longitude: counts.city_longitude, latitude: counts.city_latitude, label: counts.city, count: counts.count };
+    }
+    const label = level === "state" ? counts.state : counts.count.map(() => `Zone de ${level.replace("grid_", "")}°`);
+    return { longitude: counts.longitude, latitude: counts.latitude, label: label, count: counts.count };
+}
+
+function patchMap(figure, areas) {
+    // Stable sort by decreasing count, like components/map.py
+    const order = areas.count.map((_, i) => i).sort((a, b) => areas.count[b] - areas.count[a]);
+    const column = (name) => order.map((i) => areas[name][i]);
+    const areaCounts = column("count");
+
+    if (figure.data[0].type === "scattermapbox") {
+        const trace = figure.data[0];
+        trace.lat = column("latitude");
+        trace.lon = column("longitude");
+        trace.hovertext = column("label");
+        trace.customdata = order.map((i) => [areas.latitude[i], areas.longitude[i]]);
+        trace.marker.size = areaCounts;
+        // plotly express: sizeref = max / size_max ** 2 (size_max = 20)
+        trace.marker.sizeref = Math.max(1, ...areaCounts) / 400;
+    } else {
+        // The first trace contains the state initials
+        const trace = figure.data[1];
+        const sizes = areaCounts.map((count) => count * 1.5);
+        trace.lat = column("latitude");
+        trace.lon = column("longitude");
+        trace.text = column("label");
+        trace.customdata = areaCounts;
+        trace.marker.size = sizes;
+        trace.marker.sizeref = sizes.length ? Math.max(1, Math.max(...sizes) / MAX_MARKER_AREA) : 1;
+    }
+}
+
+function patchSentiment(figure, counts) {
+    const trace = figure.data[0];
+    const colors = {};
+    trace.labels.forEach((label, i) => (colors[label] = trace.marker.colors[i]));
+
+    trace.labels = counts.sentiment;
+    trace.values = counts.count;
+    trace.customdata = counts.sentiment.map((sentiment) => [sentiment]);
+    trace.marker.colors = counts.sentiment.map((sentiment) => colors[sentiment]);
+}
+
+function patchHeatmap(figure, counts) {
+    // Dense matrix of the years (rows, from the first to the last year with observations) and days of the year (columns, the same
+    // for all the selections), with null for the days without observation, like components/heatmap.py
+    const trace = figure.data[0];
+    const firstYear = Math.min(...counts.year);
+    const nRows = counts.count.length ? Math.max(...counts.year) - firstYear + 1 : 0;
+    const firstDay = trace.x[0];
+
+    trace.y = Array.from({ length: nRows }, (_, row) => firstYear + row);
+    trace.z = trace.y.map(() => new Array(trace.x.length).fill(null));
+    counts.count.forEach((count, i) => {
+        trace.z[counts.year[i] - firstYear][counts.day[i] - firstDay] = count;
+    });
+
+    // Same height and ticks as components/heatmap.py
+    const nYears = new Set(counts.year).size;
+    figure.layout.height = nYears <= 3 ? 200 : nYears <= 11 ? 300 : 400;
+    if (nYears <= 11) {
+        figure.layout.yaxis = { ...figure.layout.yaxis, tick0: 1, dtick: 1 };
+    }
+}
+
+function patchDensityByHour(figure, counts) {
+    const trace = figure.data[0];
+    trace.r = counts.count;
+    trace.theta = counts.hour.map((hour) => hour * 15);
+}
+
+function patchDuration(figure, counts) {
+    // Bars of the fixed bins of the log2 of the duration (the width of the bars), like components/duration.py
+    const trace = figure.data[0];
+    const width = trace.width;
+    trace.x = counts.duration_bin.map((bin) => (bin + 0.5) * width);
+    trace.y = counts.count;
+    trace.customdata = counts.duration_bin.map((bin) => [bin * width, (bin + 1) * width]);
+}
+
+function patchCulturalEvents(figure, counts) {
+    const trace = figure.data[0];
+    trace.x = counts.date_time;
+    trace.y = counts.count;
+
+    // The events (rectangles, labels and hover markers) are the ones of the decade, scaled to the new maximum
+    // like components/cultural_events.py
+    const yMax = Math.max(1, ...counts.count);
+    const yLimit = Math.floor(1.5 * yMax);
+    const resolution = Math.max(1, Math.floor(yLimit / 10));
+    const step = Math.max(1, Math.floor(yLimit / resolution));
+
+    if (figure.layout.yaxis && figure.layout.yaxis.range) {
+        figure.layout.yaxis.range = [0, 1.5 * yMax];
+    }
+    (figure.layout.annotations || []).forEach((annotation) => {
+        if (annotation.xref === "x") {
+            annotation.y = 0.975 * yMax;
+        }
+    });
+    figure.data.slice(1).forEach((eventTrace) => {
+        if (eventTrace.customdata) {
+            const y = [];
+            for (let value = 0; value < yLimit; value += step) {
+                y.push(value);
+            }
+            eventTrace.y = y;
+            eventTrace.x = new Array(resolution).fill(eventTrace.x[0]);
+            eventTrace.customdata = new Array(resolution).fill(eventTrace.customdata[0]);
+        }
+    });
+}
+
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    filtering: {
+        filter_figures: function (shapes, duration, decade, baseMap, baseSentiment, baseHeatmap, baseDensityByHour, baseDuration, baseEvents, cubeUrl) {
+            return loadCube(cubeUrl).then((cube) => {
+                const selectedCells = selectCells(cube.cells, shapes, duration, decade);
+                const patch = (base, dimension, patchFigure) => {
+                    const figure = JSON.parse(JSON.stringify(base));
+                    patchFigure(figure, dimension === "map" ? mapAreas(cube, selectedCells) : countBy(cube, dimension, selectedCells));
+                    return figure;
+                };
+
+                return [
+                    patch(baseMap, "map", patchMap),
+                    patch(baseSentiment, "sentiment", patchSentiment),
+                    patch(baseHeatmap, "day", patchHeatmap),
+                    patch(baseDensityByHour, "hour", patchDensityByHour),
+                    patch(baseDuration, "duration", patchDuration),
+                    patch(baseEvents, "month", patchCulturalEvents),
+                ];
+            });
+        },
+    },
+});
@@ -0,0 +1,68 @@
+"""
+This script measures the server time of each interaction with the filter box and the geo toggle,
+when all the figures are redrawn by a single callback (as before the callbacks were split) and with the split callbacks,
+where the geo toggle only redraws the map. The figure cache is disabled, so that every figure is drawn.
+
+Usage (from the src folder): python -m benchmarks.callback_latency --runs 5
+"""
+
+import argparse
+import statistics
+import time
+
+import app
+import figure_cache
+
+# Interactions: (filter box state, geo toggle) before and after the interaction
+INTERACTIONS = {
+    "geo toggle": ((["light", "circle"], "all", "2000", False), (["light", "circle"], "all", "2000", True)),
+    "shape filter": ((["light"], "all", "Toutes", False), (["light", "circle"], "all", "Toutes", False)),
+    "decade filter": (([], "all", "Toutes", False), ([], "all", "1990", False)),
+}
+
+
+def single_callback(state: tuple):
+    """
+    This function draws all the figures, like the single callback that had all the filters and the geo toggle as inputs.
+    """
+    selection = figure_cache.normalize_filters(*state[:3])
+    app.update_graphs(selection)
+    app.update_map(selection, state[3])
+
+
+def split_callbacks(previous_state: tuple, state: tuple):
+    """
+    This function runs the callbacks triggered by the interaction: only the map when only the geo toggle changed.
+    """
+    if previous_state[:3] == state[:3]:
+        app.update_map(figure_cache.normalize_filters(*state[:3]), state[3])
+    else:
+        single_callback(state)
+
+
+def measure(function, runs: int) -> float:
+    """
+    This function returns the median time (in ms) of the function, with the selections computed again at every run.
+    """
+    times = []
+    for _ in range(runs):
+        app.select_observations.cache_clear()
+        start = time.perf_counter()
+        function()
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the latency of the single and split callbacks.")
+    parser.add_argument("--runs", type=int, default=5, help="Number of runs per interaction.")
+    args = parser.parse_args()
+
+    # Disable the figure cache (no figure fits in 0 bytes)
+    app.figures_cache = figure_cache.FigureCache(0)
+
+    print(f"{'interaction':<16}{'single (ms)':>13}{'split (ms)':>12}")
+    for interaction, (previous_state, state) in INTERACTIONS.items():
+        single_time = measure(lambda: single_callback(state), args.runs)
+        split_time = measure(lambda: split_callbacks(previous_state, state), args.runs)
+        print(f"{interaction:<16}{single_time:>13.1f}{split_time:>12.1f}")
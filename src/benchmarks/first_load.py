@@ -0,0 +1,84 @@
+"""
+This script measures the time to interactive of the application: the startup of a worker (import of app.py, which draws the initial figures)
+and the server time of the first page load (layout, dependencies and the callbacks that Dash calls on the initial load).
+
+Usage (from the src folder): python -m benchmarks.first_load
+"""
+
+import json
+import time
+
+start = time.perf_counter()
+import app
+
+startup_time = time.perf_counter() - start
+
+
+def find_components(component, components: dict):
+    """
+    This function collects the components of the layout that have an id, by id.
+    """
+    if getattr(component, "id", None) is not None:
+        components[component.id] = component
+
+    children = getattr(component, "children", None)
+    if not isinstance(children, (list, tuple)):
+        children = [children]
+    for child in children:
+        if hasattr(child, "to_plotly_json"):
+            find_components(child, components)
+
+    return components
+
+
+def initial_callback_request(dependency: dict, components: dict, values: dict) -> dict:
+    """
+    This function returns the request sent by the browser for an initial callback,
+    with the values of the inputs returned by the previous callbacks or else the values in the layout.
+    """
+    outputs = [{"id": output.split(".")[0], "property": output.split(".")[1]} for output in dependency["output"].strip(".").split("...")]
+    inputs = [
+        {
+            "id": item["id"],
+            "property": item["property"],
+            "value": values.get((item["id"], item["property"]), getattr(components[item["id"]], item["property"], None)),
+        }
+        for item in dependency["inputs"]
+    ]
+    return {
+        "output": dependency["output"],
+        "outputs": outputs if len(outputs) > 1 else outputs[0],
+        "inputs": inputs,
+        "changedPropIds": [],
+    }
+
+
+if __name__ == "__main__":
+    client = app.server.test_client()
+    components = find_components(app.app.layout, {})
+
+    start = time.perf_counter()
+    client.get("/")
+    client.get("/_dash-layout")
+    dependencies = client.get("/_dash-dependencies").json
+
+    # Callbacks of the application (not the pattern-matching ones of the theme components) called on the initial load,
+    # in the order of the dependencies, the outputs of a callback being the inputs of the next ones
+    values = {}
+    initial_callbacks = [
+        dependency
+        for dependency in dependencies
+        if not dependency.get("prevent_initial_call") and not dependency["output"].startswith("{")
+    ]
+    for dependency in initial_callbacks:
+        request = initial_callback_request(dependency, components, values)
+        response = client.post("/_dash-update-component", data=json.dumps(request), content_type="application/json")
+        for component_id, properties in response.json["response"].items():
+            for component_property, value in properties.items():
+                values[(component_id, component_property)] = value
+
+    first_load_time = time.perf_counter() - start
+
+    print(f">>> Worker startup (import app): {startup_time * 1000:.0f} ms")
+    print(f">>> First page load: {first_load_time * 1000:.0f} ms ({len(initial_callbacks)} initial callbacks)")
+    print(f">>> Time to interactive (server): {(startup_time + first_load_time) * 1000:.0f} ms")
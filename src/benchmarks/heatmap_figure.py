@@ -0,0 +1,88 @@
+"""
+This script compares the heatmap of the observations by day drawn as one scatter marker per (year, day of the year) with observations
+(as before) and as a single heatmap trace of the dense year x day of the year matrix (components/heatmap.py).
+It reports the size of the figure, the number of marks drawn by the browser, the server time to draw and serialize the figure
+and the time to parse it in Node.js (not reported when node is not installed).
+
+Usage (from the src folder): python -m benchmarks.heatmap_figure --runs 10
+"""
+
+import argparse
+import gzip
+import statistics
+import time
+
+import plotly.express as px
+import plotly.io as pio
+
+import app
+from benchmarks.map_payload import parse_time
+from components.heatmap import draw_heatmap_graph, MONTHS_START_DAY, MONTHS_ABBREV_FR
+
+# Filter box states of the measured heatmaps
+SELECTIONS = [
+    ([], "all", "Toutes"),
+    (["light", "circle"], "all", "Toutes"),
+    ([], "all", "2000"),
+]
+
+
+def draw_scatter_heatmap(cube_slice):
+    """
+    This function draws the heatmap as before: one square marker per (year, day of the year) with observations.
+    """
+    daily_density = cube_slice.count_by("day").rename(columns={"count": "counts"})
+    fig = px.scatter(daily_density, x="day", y="year", color="counts", color_continuous_scale=["#dfecdf", "#305030"])
+
+    n_years = daily_density["year"].nunique()
+    if n_years <= 11:
+        fig.update_yaxes(tick0=1, dtick=1)
+
+    fig.update_layout(
+        xaxis_title_text="Jour de l'année",
+        yaxis_title_text="Année",
+        coloraxis_colorbar=dict(title="Nombre"),
+        height=200 if n_years <= 3 else 300 if n_years <= 11 else 400,
+    )
+    fig.update_xaxes(tickmode="array", tickvals=MONTHS_START_DAY, ticktext=MONTHS_ABBREV_FR)
+    fig.update_traces(
+        marker=dict(size=5, symbol="square"),
+        hovertemplate="<b>Jour:</b> %{x}<br><b>Année:</b> %{y}<br><b>Nombre:</b> %{marker.color}",
+    )
+    return fig
+
+
+def measure(draw_figure, cube_slice, runs: int) -> tuple:
+    """
+    This function returns the serialized figure and the median time (in ms) to draw and serialize it.
+    """
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        payload = pio.to_json(draw_figure(cube_slice), validate=False).encode("utf-8")
+        times.append((time.perf_counter() - start) * 1000)
+    return payload, statistics.median(times)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the scatter and dense matrix heatmaps.")
+    parser.add_argument("--runs", type=int, default=10, help="Number of runs per figure.")
+    args = parser.parse_args()
+
+    print(f"{'selection':<40}{'figure':>9}{'marks':>8}{'kB':>8}{'gzip kB':>9}{'server (ms)':>13}{'parse (ms)':>12}")
+    for state in SELECTIONS:
+        _, cube_slice = app.select_observations(app.figure_cache.normalize_filters(*state))
+        # Marks drawn by the browser: one SVG marker per point for the scatter, one image for the heatmap
+        figures = {
+            "scatter": (draw_scatter_heatmap, len(cube_slice.count_by("day"))),
+            "heatmap": (draw_heatmap_graph, 1),
+        }
+
+        for name, (draw_figure, n_marks) in figures.items():
+            payload, server_time = measure(draw_figure, cube_slice, args.runs)
+            duration = parse_time(payload, args.runs)
+            parse = f"{duration:.2f}" if duration is not None else "n/a"
+            print(
+                f"{str(state):<40}{name:>9}{n_marks:>8}{len(payload) / 1024:>8.1f}"
+                f"{len(gzip.compress(payload)) / 1024:>9.1f}{server_time:>13.1f}{parse:>12}"
+            )
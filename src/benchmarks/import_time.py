@@ -0,0 +1,62 @@
+"""
+This script measures the cold import time and memory of the serving data access module
+compared to the preprocessing module (which imports nltk and textblob).
+Each import is done in a fresh Python process so nothing is already cached in sys.modules.
+
+Usage (from the src folder): python -m benchmarks.import_time --runs 5
+"""
+
+import argparse
+import statistics
+import subprocess
+import sys
+
+
+MODULES = ["data_access", "preprocess"]
+
+# Code executed in the child process: import the module and report the elapsed time and the max RSS
+CHILD_CODE = """
+import time, resource, sys
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+heavy = sorted(m for m in ("nltk", "textblob") if m in sys.modules)
+print(elapsed, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, ",".join(heavy) or "-")
+"""
+
+
+def measure_import(module, runs):
+    """
+    This function imports the given module in `runs` fresh processes
+    and returns the median import time, the median max RSS (in MB) and the heavy libraries loaded.
+    """
+    times, memories = [], []
+    heavy = "-"
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, "-c", CHILD_CODE.format(module=module)],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.split()
+        times.append(float(output[0]))
+        memories.append(int(output[1]) / 1024)  # ru_maxrss is in kilobytes on Linux
+        heavy = output[2]
+    return statistics.median(times), statistics.median(memories), heavy
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the cold import cost of the serving and preprocessing modules.")
+    parser.add_argument("--runs", type=int, default=5, help="Number of fresh processes per module.")
+    args = parser.parse_args()
+
+    results = {}
+    print(f"{'module':<14}{'import (s)':>12}{'max RSS (MB)':>15}  heavy libraries")
+    for module in MODULES:
+        results[module] = measure_import(module, args.runs)
+        elapsed, memory, heavy = results[module]
+        print(f"{module:<14}{elapsed:>12.3f}{memory:>15.1f}  {heavy}")
+
+    speedup = results["preprocess"][0] / results["data_access"][0]
+    saved = results["preprocess"][1] - results["data_access"][1]
+    print(f">>> data_access imports {speedup:.1f}x faster and uses {saved:.1f} MB less per worker")
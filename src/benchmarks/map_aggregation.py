@@ -0,0 +1,86 @@
+"""
+This script compares the ways of counting the observations of each city for the map, on the selected rows of the full dataset:
+- groupby: the groupby of the city columns (two floats and the name) followed by a full sort, as restructure_df did on every callback
+- bincount: a bincount of the city ids of the selected rows followed by a partial selection of the top cities (argpartition)
+- cube: the count of the city dimension of the aggregate cube for the selected cells (what the map does), followed by the sort
+
+Usage (from the src folder): python -m benchmarks.map_aggregation --runs 20
+"""
+
+import argparse
+import statistics
+import time
+
+import numpy as np
+
+import aggregates
+import data_access
+from components.map import MAX_MARKERS
+
+# Filter box states of the measured selections
+SELECTIONS = [
+    ([], "all", "Toutes"),
+    (["light", "circle"], "all", "Toutes"),
+    (["other"], "long", "2000"),
+]
+
+
+def groupby_counts(df, mask: np.ndarray):
+    """
+    This function counts the selected observations by city with a groupby and sorts the cities by count.
+    """
+    df_by_city = df[mask].groupby(["city_longitude", "city_latitude", "city"], observed=True).size().reset_index(name="count")
+    return df_by_city.sort_values(by="count", ascending=False, kind="stable")
+
+
+def bincount_counts(city_ids: np.ndarray, n_cities: int, mask: np.ndarray):
+    """
+    This function counts the selected observations by city id and returns the ids and counts of the top MAX_MARKERS cities.
+    """
+    counts = np.bincount(city_ids[mask], minlength=n_cities)
+    top = np.argpartition(-counts, MAX_MARKERS)[:MAX_MARKERS] if n_cities > MAX_MARKERS else np.arange(n_cities)
+    top = top[counts[top] > 0]
+    top = top[np.argsort(-counts[top], kind="stable")]
+    return top, counts[top]
+
+
+def cube_counts(cube: aggregates.AggregateCube, state: tuple):
+    """
+    This function counts the selected observations by city from the aggregate cube and sorts the cities by count.
+    """
+    df_by_city = cube.slice(*state).count_by("city")
+    return df_by_city.sort_values(by="count", ascending=False, kind="stable")
+
+
+def measure(function, runs: int) -> float:
+    """
+    This function returns the median time (in ms) of the function.
+    """
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        function()
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the groupby, bincount and cube counts of the observations by city.")
+    parser.add_argument("--runs", type=int, default=20, help="Number of runs per selection.")
+    args = parser.parse_args()
+
+    df = data_access.load_data()
+    filter_index = data_access.build_filter_index(df)
+    cube = aggregates.AggregateCube(df)
+
+    located = df["city_id"].to_numpy() >= 0
+    city_ids = df["city_id"].to_numpy()
+    n_cities = len(data_access.city_table(df))
+
+    print(f"{'selection':<36}{'groupby (ms)':>14}{'bincount (ms)':>15}{'cube (ms)':>11}")
+    for state in SELECTIONS:
+        mask = data_access.filter_mask(filter_index, *state)
+        groupby_time = measure(lambda: groupby_counts(df, mask), args.runs)
+        bincount_time = measure(lambda: bincount_counts(city_ids, n_cities, mask & located), args.runs)
+        cube_time = measure(lambda: cube_counts(cube, state), args.runs)
+        print(f"{str(state):<36}{groupby_time:>14.2f}{bincount_time:>15.2f}{cube_time:>11.2f}")
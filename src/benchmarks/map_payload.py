@@ -0,0 +1,92 @@
+"""
+This script measures the size of the map figure sent to the browser, as JSON numbers and in the compact form (COMPACT_MAP_PAYLOAD in app.py),
+and the time the browser takes to parse it: JSON.parse and the decoding of the typed arrays, like plotly.js does.
+The parse time is measured with Node.js, and is not reported when node is not installed.
+
+Usage (from the src folder): python -m benchmarks.map_payload --runs 20
+"""
+
+import argparse
+import gzip
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+
+import plotly.io as pio
+
+import app
+from components.map import draw_map, compact_map_figure
+
+# Filter box states and geo toggle of the measured maps
+MAPS = [
+    (([], "all", "Toutes"), False),
+    (([], "all", "Toutes"), True),
+    ((["light", "circle"], "all", "Toutes"), False),
+    ((["other"], "long", "2000"), True),
+]
+
+# Median time (in ms) of JSON.parse of the payload and of the decoding of its typed arrays (base64 to typed array)
+PARSE_SCRIPT = """
+const payload = require("fs").readFileSync(process.argv[1], "utf8");
+const runs = Number(process.argv[2]);
+const types = { f4: Float32Array, f8: Float64Array, u4: Uint32Array, i4: Int32Array };
+const decode = (value) => {
+    if (Array.isArray(value)) {
+        value.forEach(decode);
+    } else if (value && typeof value === "object") {
+        if (typeof value.bdata === "string" && types[value.dtype]) {
+            const bytes = Buffer.from(value.bdata, "base64");
+            return new types[value.dtype](bytes.buffer, bytes.byteOffset, bytes.length / types[value.dtype].BYTES_PER_ELEMENT);
+        }
+        Object.values(value).forEach(decode);
+    }
+};
+const times = [];
+for (let run = 0; run < runs; run++) {
+    const start = process.hrtime.bigint();
+    decode(JSON.parse(payload));
+    times.push(Number(process.hrtime.bigint() - start) / 1e6);
+}
+times.sort((a, b) => a - b);
+console.log(times[Math.floor(runs / 2)]);
+"""
+
+
+def parse_time(payload: bytes, runs: int) -> float:
+    """
+    This function returns the median time (in ms) to parse the payload in Node.js, or None when node is not installed.
+    """
+    if shutil.which("node") is None:
+        return None
+
+    with tempfile.NamedTemporaryFile("wb", suffix=".json", delete=False) as file:
+        file.write(payload)
+
+    try:
+        result = subprocess.run(["node", "-e", PARSE_SCRIPT, file.name, str(runs)], capture_output=True, text=True, check=True)
+        return float(result.stdout)
+    finally:
+        os.remove(file.name)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the size and parse time of the JSON and compact map figures.")
+    parser.add_argument("--runs", type=int, default=20, help="Number of parses per payload.")
+    args = parser.parse_args()
+
+    print(f"{'map':<44}{'mode':>9}{'kB':>8}{'gzip kB':>9}{'parse (ms)':>12}")
+    for state, geo_toggle_value in MAPS:
+        _, cube_slice = app.select_observations(app.figure_cache.normalize_filters(*state))
+        figure = draw_map(cube_slice, geo_toggle_value)
+        payloads = {
+            "json": pio.to_json(figure, validate=False).encode("utf-8"),
+            "compact": pio.to_json(compact_map_figure(figure), validate=False).encode("utf-8"),
+        }
+
+        for mode, payload in payloads.items():
+            duration = parse_time(payload, args.runs)
+            parse = f"{duration:.2f}" if duration is not None else "n/a"
+            label = f"{state} {'geo' if geo_toggle_value else 'map'}"
+            print(f"{label:<44}{mode:>9}{len(payload) / 1024:>8.1f}{len(gzip.compress(payload)) / 1024:>9.1f}{parse:>12}")
@@ -0,0 +1,84 @@
+"""
+This script measures the server time of update_graphs when its figures are drawn one after another and by pools of threads
+(FIGURE_BUILD_THREADS in app.py), compared to the time of its slowest figure, which bounds the time of the concurrent builds.
+It also prints the median time of each figure. The figure cache is disabled, so that every figure is drawn.
+
+Usage (from the src folder): python -m benchmarks.parallel_figures --threads 1 2 4 --runs 5
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import statistics
+import time
+
+import app
+import figure_cache
+
+# Filter box states of the measured calls of update_graphs
+SELECTIONS = [
+    ([], "all", "Toutes"),
+    (["light", "circle"], "all", "2000"),
+    (["other"], "long", "Pre-1980"),
+]
+
+
+def timed_figure(name: str, filters: tuple) -> float:
+    """
+    This function returns the time (in ms) taken to get the figure of update_graphs (from the cache or drawn).
+    """
+    start = time.perf_counter()
+    app.cached_figure((name, filters), app.FIGURE_BUILDERS[name], filters)
+    return (time.perf_counter() - start) * 1000
+
+
+def figure_times(selection: list) -> dict:
+    """
+    This function returns the time (in ms) of each figure of update_graphs, once the selection is computed.
+    """
+    filters = app.selection_filters(selection)
+    app.select_observations.cache_clear()
+    app.select_observations(filters)
+    return {name: timed_figure(name, filters) for name in app.FIGURE_BUILDERS}
+
+
+def measure(selection: list, runs: int) -> tuple:
+    """
+    This function returns the median time (in ms) of update_graphs and of its slowest figure, with the selection computed again at every run.
+    """
+    times = []
+    slowest_times = []
+    for _ in range(runs):
+        app.select_observations.cache_clear()
+        start = time.perf_counter()
+        app.update_graphs(selection)
+        times.append((time.perf_counter() - start) * 1000)
+
+        slowest_times.append(max(figure_times(selection).values()))
+
+    return statistics.median(times), statistics.median(slowest_times)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the latency of update_graphs with sequential and concurrent figure builds.")
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 2, 4], help="Numbers of threads drawing the figures.")
+    parser.add_argument("--runs", type=int, default=5, help="Number of runs per selection.")
+    args = parser.parse_args()
+
+    # Disable the figure cache (no figure fits in 0 bytes)
+    app.figures_cache = figure_cache.FigureCache(0)
+
+    print(f"{'selection':<36}{'threads':>8}{'update_graphs (ms)':>20}{'slowest figure (ms)':>21}")
+    for state in SELECTIONS:
+        selection = list(figure_cache.normalize_filters(*state))
+        for n_threads in args.threads:
+            app.figure_pool = ThreadPoolExecutor(max_workers=n_threads) if n_threads > 1 else None
+            total_time, slowest_time = measure(selection, args.runs)
+            print(f"{str(state):<36}{n_threads:>8}{total_time:>20.1f}{slowest_time:>21.1f}")
+
+    app.figure_pool = None
+    print(f"\n{'selection':<36}" + "".join(f"{name:>16}" for name in app.FIGURE_BUILDERS) + "  (ms)")
+    for state in SELECTIONS:
+        selection = list(figure_cache.normalize_filters(*state))
+        runs = [figure_times(selection) for _ in range(args.runs)]
+        medians = [statistics.median(times[name] for times in runs) for name in app.FIGURE_BUILDERS]
+        print(f"{str(state):<36}" + "".join(f"{median:>16.1f}" for median in medians))
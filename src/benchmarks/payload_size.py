@@ -0,0 +1,114 @@
+"""
+This script measures the size of the responses of the figure callbacks for a sequence of interactions with the filter box and the geo toggle,
+when the callbacks send the full figures and when they send partial updates (Patch) from the figures displayed by the browser.
+The sizes are given as sent by the live callbacks (identity), compressed with gzip, and as sent from the prebuilt store
+(full figures precompressed with brotli, or gzip without the brotli package, see prebuilt_figures.py), which is what production sends.
+
+Usage (from the src folder): python -m benchmarks.payload_size
+"""
+
+import gzip
+import json
+
+import app
+import figure_cache
+import prebuilt_figures
+
+# Sequence of interactions: state of the filter box and of the geo toggle after each interaction
+INTERACTIONS = [
+    ("shape filter", (["light"], "all", "Toutes", False)),
+    ("shape filter", (["circle", "light"], "all", "Toutes", False)),
+    ("duration filter", (["circle", "light"], "long", "Toutes", False)),
+    ("decade filter", (["circle", "light"], "long", "2000", False)),
+    ("geo toggle", (["circle", "light"], "long", "2000", True)),
+    ("decade filter", (["circle", "light"], "long", "1990", True)),
+    ("reset", ([], "all", "Toutes", True)),
+]
+
+
+def callback_request(dependency: dict, values: dict, displayed_keys: list) -> dict:
+    """
+    This function returns the request sent by the browser for a figure callback, with the keys of the displayed figures
+    (None to receive the full figures).
+    """
+    outputs = [{"id": output.split(".")[0], "property": output.split(".")[1]} for output in dependency["output"].strip(".").split("...")]
+    return {
+        "output": dependency["output"],
+        "outputs": outputs if len(outputs) > 1 else outputs[0],
+        "inputs": [{"id": item["id"], "property": item["property"], "value": values[item["id"]]} for item in dependency["inputs"]],
+        "state": [{"id": item["id"], "property": item["property"], "value": displayed_keys} for item in dependency["state"]],
+        "changedPropIds": [],
+    }
+
+
+def prebuilt_size(body: bytes) -> int:
+    """
+    This function returns the size of the full figure response as sent from the prebuilt store, with the best encoding it stores.
+    """
+    if prebuilt_figures.brotli is not None:
+        return len(prebuilt_figures.brotli.compress(body, quality=11))
+    return len(gzip.compress(body, compresslevel=9, mtime=0))
+
+
+def displayed_key(update, previous_key: list) -> list:
+    """
+    This function returns the key of the figure displayed by a graph after the update (full figure or Patch operations).
+    """
+    if "operations" in update:
+        for operation in update["operations"]:
+            if operation["location"] == ["layout", "meta"]:
+                return operation["params"]["value"]
+        return previous_key
+
+    return update["layout"]["meta"]
+
+
+if __name__ == "__main__":
+    # The prebuilt responses (full figures) are not used, so that the callbacks are called
+    app.prebuilt_store.responses = {}
+    client = app.server.test_client()
+
+    dependencies = [
+        dependency
+        for dependency in client.get("/_dash-dependencies").json
+        if any(item["id"] == "selection" for item in dependency["inputs"])
+    ]
+    displayed_keys = [app.initial_figures[name]["layout"]["meta"] for name in app.GRAPHS]
+    previous_values = {"selection": list(app.DEFAULT_FILTERS), "geo_toggler": False}
+
+    print(f"{'interaction':<18}{'full (kB)':>11}{'patch (kB)':>12}{'full gzip':>11}{'patch gzip':>12}{'prebuilt':>10}{'saved':>8}")
+    totals = [0, 0, 0, 0, 0]
+    for interaction, state in INTERACTIONS:
+        values = {"selection": list(figure_cache.normalize_filters(*state[:3])), "geo_toggler": state[3]}
+        sizes = [0, 0, 0, 0, 0]
+        new_keys = dict(zip(app.GRAPHS, displayed_keys))
+
+        for dependency in dependencies:
+            # Only the callbacks whose inputs changed are called by the browser
+            if all(values[item["id"]] == previous_values[item["id"]] for item in dependency["inputs"]):
+                continue
+
+            full_body = client.post("/_dash-update-component", json=callback_request(dependency, values, None)).get_data()
+            patch_body = client.post("/_dash-update-component", json=callback_request(dependency, values, displayed_keys)).get_data()
+            for index, body in enumerate([full_body, patch_body, gzip.compress(full_body), gzip.compress(patch_body)]):
+                sizes[index] += len(body)
+            sizes[4] += prebuilt_size(full_body)
+
+            # The browser applies the updates, the graphs without update keep their figure (no content when none is updated)
+            for name, properties in (json.loads(patch_body)["response"] if patch_body else {}).items():
+                new_keys[name] = displayed_key(properties["figure"], new_keys[name])
+
+        displayed_keys = [new_keys[name] for name in app.GRAPHS]
+        previous_values = values
+        totals = [total + size for total, size in zip(totals, sizes)]
+        full_kb, patch_kb, full_gzip_kb, patch_gzip_kb, prebuilt_kb = (size / 1024 for size in sizes)
+        print(
+            f"{interaction:<18}{full_kb:>11.1f}{patch_kb:>12.1f}{full_gzip_kb:>11.1f}{patch_gzip_kb:>12.1f}{prebuilt_kb:>10.1f}"
+            f"{1 - sizes[1] / sizes[0]:>8.0%}"
+        )
+
+    full_kb, patch_kb, full_gzip_kb, patch_gzip_kb, prebuilt_kb = (total / 1024 for total in totals)
+    print(
+        f"{'total':<18}{full_kb:>11.1f}{patch_kb:>12.1f}{full_gzip_kb:>11.1f}{patch_gzip_kb:>12.1f}{prebuilt_kb:>10.1f}"
+        f"{1 - totals[1] / totals[0]:>8.0%}"
+    )
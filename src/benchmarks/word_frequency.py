@@ -0,0 +1,68 @@
+"""
+This script compares the ways of counting the words of the summaries of the selected observations for the word frequency graph:
+- counter: joining the selected summaries, splitting them into words and counting them with a Counter, as restructure_df did on every callback
+- index: summing the precomputed word counts of the selected rows (token_index.py) and selecting the top words (what the graph does)
+It checks that both give the same top words.
+
+Usage (from the src folder): python -m benchmarks.word_frequency --runs 20
+"""
+
+from collections import Counter
+import argparse
+import statistics
+import time
+
+import numpy as np
+import pandas as pd
+
+import data_access
+import token_index
+
+# Filter box states of the measured selections
+SELECTIONS = [
+    ([], "all", "Toutes"),
+    (["light", "circle"], "all", "Toutes"),
+    ([], "all", "2000"),
+    (["other"], "long", "Pre-1980"),
+]
+
+
+def counter_top_words(df: pd.DataFrame, mask: np.ndarray) -> pd.DataFrame:
+    """
+    This function counts the words of the selected summaries with a Counter and returns the top 10 words.
+    """
+    all_words = " ".join(df.loc[mask, "summary"]).lower().split()
+    return pd.DataFrame(Counter(all_words).most_common(10), columns=["Word", "Count"])
+
+
+def measure(function, runs: int) -> float:
+    """
+    This function returns the median time (in ms) of the function.
+    """
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        function()
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the Counter and token index counts of the words of the summaries.")
+    parser.add_argument("--runs", type=int, default=20, help="Number of runs per selection.")
+    args = parser.parse_args()
+
+    df = data_access.load_data()
+    filter_index = data_access.build_filter_index(df)
+
+    start = time.perf_counter()
+    tokens = token_index.build_token_index(df["summary"])
+    print(f">>> Token index built in {time.perf_counter() - start:.2f} s: {len(tokens.vocabulary)} words, {len(tokens.token_ids)} entries")
+
+    print(f"{'selection':<40}{'rows':>7}{'counter (ms)':>14}{'index (ms)':>12}{'same':>6}")
+    for state in SELECTIONS:
+        mask = data_access.filter_mask(filter_index, *state)
+        same = counter_top_words(df, mask).equals(tokens.top_words(mask, 10))
+        counter_time = measure(lambda: counter_top_words(df, mask), args.runs)
+        index_time = measure(lambda: tokens.top_words(mask, 10), args.runs)
+        print(f"{str(state):<40}{np.count_nonzero(mask):>7}{counter_time:>14.2f}{index_time:>12.2f}{str(same):>6}")
@@ -0,0 +1,110 @@
+"""
+This script measures the memory of the gunicorn workers once they are booted, when each worker loads the application itself
+and when the application is loaded once in the master before the workers are forked (preload, see gunicorn.conf.py).
+
+For each worker, it reports the resident memory (RSS), the memory private to the worker (USS, not shared with the master or the other workers)
+and the proportional share (PSS, the shared pages being divided between the processes). The total PSS is the memory used by the server.
+It reads /proc/<pid>/smaps_rollup, so it only runs on Linux.
+
+Usage (from the src folder): python -m benchmarks.worker_memory --workers 4
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+
+def memory(pid: int) -> dict:
+    """
+    This function returns the RSS, USS and PSS of the process (in MB).
+    """
+    values = {}
+    with open(f"/proc/{pid}/smaps_rollup") as file:
+        for line in file:
+            fields = line.split()
+            if len(fields) == 3 and fields[2] == "kB":
+                values[fields[0].rstrip(":")] = int(fields[1]) / 1024
+
+    return {
+        "rss": values["Rss"],
+        "uss": values["Private_Clean"] + values["Private_Dirty"],
+        "pss": values["Pss"],
+    }
+
+
+def worker_pids(master_pid: int) -> list[int]:
+    """
+    This function returns the pids of the workers (children) of the gunicorn master.
+    """
+    with open(f"/proc/{master_pid}/task/{master_pid}/children") as file:
+        return [int(pid) for pid in file.read().split()]
+
+
+def wait_until_booted(master: subprocess.Popen, n_workers: int, url: str, timeout: float = 300):
+    """
+    This function waits until the server answers and the memory of all its workers is stable (application loaded).
+    """
+    deadline = time.time() + timeout
+    previous = None
+    while time.time() < deadline:
+        if master.poll() is not None:
+            raise RuntimeError("gunicorn exited before the workers were booted")
+        time.sleep(1)
+
+        try:
+            urllib.request.urlopen(url, timeout=5)
+        except OSError:
+            continue
+
+        pids = worker_pids(master.pid)
+        if len(pids) < n_workers:
+            continue
+        current = [round(memory(pid)["rss"]) for pid in pids]
+        if current == previous:
+            return
+        previous = current
+
+    raise RuntimeError("The workers were not booted in time")
+
+
+def measure(n_workers: int, config_path: str, port: int) -> tuple:
+    """
+    This function starts gunicorn with the configuration file and returns the memory of the master and of each worker once booted.
+    """
+    url = f"http://127.0.0.1:{port}/figure-cache"
+    command = [sys.executable, "-m", "gunicorn", "--config", config_path, "--workers", str(n_workers), "--bind", f"127.0.0.1:{port}", "app:server"]
+    master = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    try:
+        wait_until_booted(master, n_workers, url)
+        return memory(master.pid), [memory(pid) for pid in worker_pids(master.pid)]
+    finally:
+        master.terminate()
+        master.wait()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the memory of the gunicorn workers with and without preload.")
+    parser.add_argument("--workers", type=int, default=4, help="Number of gunicorn workers.")
+    parser.add_argument("--port", type=int, default=8050, help="Port of the measured server.")
+    args = parser.parse_args()
+
+    # Without a configuration file, gunicorn would read gunicorn.conf.py (preload) from the current folder
+    with tempfile.NamedTemporaryFile("w", suffix=".py", delete=False) as empty_config:
+        pass
+
+    try:
+        modes = {"no preload": empty_config.name, "preload": "gunicorn.conf.py"}
+
+        print(f"{'mode':<12}{'worker RSS':>12}{'worker USS':>12}{'worker PSS':>12}{'master PSS':>12}{'total PSS':>11}  (MB, {args.workers} workers)")
+        for mode, config_path in modes.items():
+            master, workers = measure(args.workers, config_path, args.port)
+            average = {name: sum(worker[name] for worker in workers) / len(workers) for name in ["rss", "uss", "pss"]}
+            total_pss = master["pss"] + sum(worker["pss"] for worker in workers)
+            print(f"{mode:<12}{average['rss']:>12.1f}{average['uss']:>12.1f}{average['pss']:>12.1f}{master['pss']:>12.1f}{total_pss:>11.1f}")
+    finally:
+        os.remove(empty_config.name)
@@ -2,6 +2,7 @@ import plotly.graph_objects as go
 import pandas as pd
 import plotly.express as px
 from datetime import datetime
+from aggregates import CubeSlice
 
 EVENT_CATEGORY_COLORS = {
     "Film/Série": "deepskyblue",
@@ -10,7 +11,7 @@ EVENT_CATEGORY_COLORS = {
 }
 
 
-def draw_cultural_events_graph(df: pd.DataFrame, events_db: pd.DataFrame) -> go.Figure:
+def draw_cultural_events_graph(cube_slice: CubeSlice, events_db: pd.DataFrame) -> go.Figure:
     """
     This function draws a line graph of the number of observations over time
     with vertical rectangles representing cultural events colored by their given category (Film/Série, Mission Spatiale, Autres)
@@ -22,10 +23,10 @@ def draw_cultural_events_graph(df: pd.DataFrame, events_db: pd.DataFrame) -> go.
     since they cannot be predicted in advance, in contrast to movies or space missions.
     """
 
-    cultural_events_df = restructure_df(df)
+    cultural_events_df = restructure_df(cube_slice)
 
-    min_year = df["date_time"].dt.year.min()
-    max_year = df["date_time"].dt.year.max()
+    min_year = cultural_events_df["date_time"].dt.year.min()
+    max_year = cultural_events_df["date_time"].dt.year.max()
 
     year_range = max_year - min_year
     # print(f"Year range: {year_range}")
@@ -90,13 +91,16 @@ def draw_cultural_events_graph(df: pd.DataFrame, events_db: pd.DataFrame) -> go.
             line_width=0,
         )
 
+        # At least one hover marker, so that the selections with a maximum below 7 observations do not divide by zero
+        # (same guards as patchCulturalEvents in assets/clientside_filtering.js)
         y_limit = int(1.5 * y_max)
-        resolution = int(y_limit / 10)
+        resolution = max(1, int(y_limit / 10))
+        step = max(1, y_limit // resolution)
 
         fig.add_trace(
             go.Scatter(
                 x=[date_mid] * resolution,
-                y=[i for i in range(0, y_limit, y_limit // resolution)],
+                y=[i for i in range(0, y_limit, step)],
                 customdata=[row["name"]] * resolution,
                 opacity=0,
                 showlegend=False,
@@ -151,11 +155,10 @@ def draw_cultural_events_graph(df: pd.DataFrame, events_db: pd.DataFrame) -> go.
     return fig
 
 
-def restructure_df(df: pd.DataFrame) -> pd.DataFrame:
+def restructure_df(cube_slice: CubeSlice) -> pd.DataFrame:
 
-    cultural_events_df = (
-        df.groupby(df["date_time"].dt.to_period("M")).size().reset_index(name="count")
-    )
+    # Number of observations by month
+    cultural_events_df = cube_slice.count_by("month")
     return cultural_events_df
 
 
@@ -2,9 +2,10 @@ import plotly.graph_objects as go
 import plotly.express as px
 import pandas as pd
 import numpy as np
+from aggregates import CubeSlice
 
 
-def draw_density_by_hour_graph(df) -> go.Figure:
+def draw_density_by_hour_graph(cube_slice: CubeSlice) -> go.Figure:
     """
     This function draws a polar bar graph of the number of observations by hour of the day on a 24-hour clock
     Since the data is from 0 to 23, each value gets myltiplied by 15 to get the angle in degrees (0 to 360).
@@ -14,7 +15,7 @@ def draw_density_by_hour_graph(df) -> go.Figure:
     The radius "r" can be any of the following: "frequency", "log_frequency", "sqrt_frequency" to represent the data differently.
     """
 
-    df = restructure_df(df)
+    df = restructure_df(cube_slice)
 
     fig = px.bar_polar(
         df,
@@ -58,17 +59,12 @@ def draw_density_by_hour_graph(df) -> go.Figure:
     return fig
 
 
-def restructure_df(df: pd.DataFrame) -> pd.DataFrame:
+def restructure_df(cube_slice: CubeSlice) -> pd.DataFrame:
 
     ANGLE_PER_HOUR = 360 / 24
 
-    # Deep copy only the date_time column
-    hourly_df = df[['date_time']].copy(deep=True)
-    hourly_df["hour"] = hourly_df["date_time"].dt.hour
-
-    # Drop all columns except "hour", add a column "frequency" that counts the number of observations for each hour
-    hourly_df = hourly_df[["hour"]]
-    hourly_df = hourly_df.groupby(["hour"]).size().reset_index(name="frequency")
+    # Column "frequency" with the number of observations for each hour
+    hourly_df = cube_slice.count_by("hour").rename(columns={"count": "frequency"})
     hourly_df["angle"] = hourly_df["hour"] * ANGLE_PER_HOUR
 
     # Add a transformed frequency column : log_frequency and sqrt_frequency
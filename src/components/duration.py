@@ -1,28 +1,30 @@
 import plotly.graph_objects as go
-import plotly.express as px
 import pandas as pd
 import numpy as np
+from aggregates import CubeSlice, DURATION_BIN_WIDTH
 
 
-def draw_duration_graph(df: pd.DataFrame) -> go.Figure:
+def draw_duration_graph(cube_slice: CubeSlice) -> go.Figure:
     """
     This function draws a histogram of the duration of the observations with a logarithmic scale (base 2) on the x-axis (seconds)
     Custom tick values are used to represent common time intervals (e.g. 1 sec, 10 sec, 30 sec, 1 min, 5 min, ...)
+
+    The histogram is binned on the server, with the fixed bins of aggregates.duration_bins: only the height of each bin is sent.
     """
 
-    duration_df = restructure_df(df)
+    duration_df = restructure_df(cube_slice)
 
     # LOG DURATION
-    fig = px.histogram(
-        duration_df,
-        x="log_duration",
-        nbins=50,
-        color_discrete_sequence=["#8fbc8f"],
-        hover_data={"log_duration": False, "duration": True},
-    )
-
-    fig.update_traces(
-        hovertemplate="<b>Intervalle de durée :</b> 2e%{x:.0f} sec<br><b>Nombre:</b> %{y:.0f}"
+    # One bar per bin with observations, centered on the bin
+    fig = go.Figure(
+        go.Bar(
+            x=duration_df["log_duration"],
+            y=duration_df["count"],
+            width=DURATION_BIN_WIDTH,
+            customdata=duration_df[["log_duration_start", "log_duration_end"]],
+            marker_color="#8fbc8f",
+            hovertemplate="<b>Intervalle de durée :</b> 2e%{customdata[0]:.1f} à 2e%{customdata[1]:.1f} sec<br><b>Nombre:</b> %{y:.0f}<extra></extra>",
+        )
     )
 
     # Create custom tick values for the x-axis
@@ -59,6 +61,7 @@ def draw_duration_graph(df: pd.DataFrame) -> go.Figure:
     fig.update_layout(
         xaxis_title_text="Log durée",
         yaxis_title_text="Nombre d'observations",
+        bargap=0,
         xaxis=dict(tickmode="array", tickvals=tick_values),
     )
 
@@ -67,11 +70,12 @@ def draw_duration_graph(df: pd.DataFrame) -> go.Figure:
     return fig
 
 
-def restructure_df(df: pd.DataFrame) -> pd.DataFrame:
+def restructure_df(cube_slice: CubeSlice) -> pd.DataFrame:
 
-    # Deep copy the duration column and apply a log2 transformation
-    duration_df = df[["duration"]].copy(deep=True)
-    # duration_df["log_duration"] = duration_df["duration"].apply(lambda x: np.log2(x))
-    duration_df["log_duration"] = np.log2(duration_df["duration"])
+    # Number of observations in each bin of the log2 of the duration, with the bounds and the center of the bin
+    duration_df = cube_slice.count_by("duration")
+    duration_df["log_duration_start"] = duration_df["duration_bin"] * DURATION_BIN_WIDTH
+    duration_df["log_duration_end"] = duration_df["log_duration_start"] + DURATION_BIN_WIDTH
+    duration_df["log_duration"] = duration_df["log_duration_start"] + DURATION_BIN_WIDTH / 2
 
     return duration_df
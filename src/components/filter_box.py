@@ -35,20 +35,34 @@ The decade filter is a radio items component, enabling the user to filter by the
 - All
 """
 
+# Values (and French labels) of the filters
+SHAPE_LABELS = {
+    "light": "Lumière",
+    "circle": "Cercle",
+    "triangle": "Triangle",
+    "fireball": "Boule de feu",
+    "other": "Autres",
+}
+DURATION_LABELS = {
+    "short": "Courte (< 1 minute)",
+    "long": "Longue (> 1 minute)",
+    "all": "Toutes",
+}
+DECADES = ["Pre-1980", "1980", "1990", "2000", "2010", "2020", "Toutes"]
+
+# Default state of the filter box (all the observations), for which the figures of the initial layout are drawn
+DEFAULT_SHAPES = []
+DEFAULT_DURATION = "all"
+DEFAULT_DECADE = "Toutes"
+
 
 shape_col = dbc.Container(
     [
         html.H3("Forme"),
         dbc.Container(
             dbc.Checklist(
-                [
-                    {"value": "light", "label": "Lumière"},
-                    {"value": "circle", "label": "Cercle"},
-                    {"value": "triangle", "label": "Triangle"},
-                    {"value": "fireball", "label": "Boule de feu"},
-                    {"value": "other", "label": "Autres"},
-                ],
-                [],
+                [{"value": value, "label": label} for value, label in SHAPE_LABELS.items()],
+                DEFAULT_SHAPES,
                 id="shape_filter",
             ),
         ),
@@ -59,12 +73,8 @@ duration_col = dbc.Container(
     [
         html.H3("Durée"),
         dbc.RadioItems(
-            [
-                {"label": "Courte (< 1 minute)", "value": "short"},
-                {"label": "Longue (> 1 minute)", "value": "long"},
-                {"label": "Toutes", "value": "all"},
-            ],
-            "all",
+            [{"label": label, "value": value} for value, label in DURATION_LABELS.items()],
+            DEFAULT_DURATION,
             id="duration_filter",
         ),
     ]
@@ -75,8 +85,8 @@ decade_col = dbc.Container(
         html.H3("Décennie"),
         dbc.Container(
             dbc.RadioItems(
-                ["Pre-1980", "1980", "1990", "2000", "2010", "2020", "Toutes"],
-                "Toutes",
+                DECADES,
+                DEFAULT_DECADE,
                 id="decade_filter",
             ),
         ),
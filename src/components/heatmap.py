@@ -1,6 +1,7 @@
 import plotly.graph_objects as go
-import plotly.express as px
 import pandas as pd
+import numpy as np
+from aggregates import CubeSlice
 
 # List of French month abbreviations
 MONTHS_ABBREV_FR = ["Jan", "Fév", "Mar", "Avr", "Mai", "Jun", "Jul", "Aoû", "Sep", "Oct", "Nov", "Déc"]
@@ -9,24 +10,38 @@ MONTHS_ABBREV_FR = ["Jan", "Fév", "Mar", "Avr", "Mai", "Jun", "Jul", "Aoû", "S
 MONTHS_START_DAY = [0, 31, 59, 90, 120, 151, 181, 212, 243, 273, 304, 334]
 
 
-def draw_heatmap_graph(df) -> go.Figure:
+def draw_heatmap_graph(cube_slice: CubeSlice) -> go.Figure:
 
     """
     This function draws a heatmap of the number of observations by day of the year and year
 
     Each day of the year is represented by a square, and the color of the square represents the number of observations, in a gradient from light green to dark green
+    The days without observation are left empty.
 
     """
-    daily_density = restructure_df(df)
+    daily_density = restructure_df(cube_slice)
+
+    # The cells without observation are gaps (NaN, sent as null) rather than the lightest color
+    counts = daily_density.to_numpy()
+    z = np.where(counts > 0, counts, np.nan)
 
     # Custom color gradient with :
     # https://www.w3schools.com/colors/colors_picker.asp
     # Basecolor : # 8fbc8f
-    fig = px.scatter(daily_density, x="day", y="year", color="counts", color_continuous_scale=["#dfecdf", "#305030"])
+    fig = go.Figure(
+        go.Heatmap(
+            x=daily_density.columns,
+            y=daily_density.index,
+            z=z,
+            colorscale=[[0, "#dfecdf"], [1, "#305030"]],
+            colorbar=dict(title="Nombre"),
+            hoverongaps=False,
+            hovertemplate="<b>Jour:</b> %{x}<br><b>Année:</b> %{y}<br><b>Nombre:</b> %{z}<extra></extra>",
+        )
+    )
 
-    # Get unique years to determine the spread in the y-axis
-    years = daily_density["year"].unique()
-    n_years = len(years)
+    # Get the years with observations to determine the spread in the y-axis
+    n_years = int((counts > 0).any(axis=1).sum())
 
     def height_by_years(n_years):
         if n_years <= 3: # Special case for 2020-2022 (3 years)
@@ -43,7 +58,6 @@ def draw_heatmap_graph(df) -> go.Figure:
     fig.update_layout(
         xaxis_title_text="Jour de l'année",
         yaxis_title_text="Année",
-        coloraxis_colorbar=dict(title="Nombre"),
         height=height_by_years(n_years),
     )
 
@@ -53,20 +67,16 @@ def draw_heatmap_graph(df) -> go.Figure:
         ticktext=MONTHS_ABBREV_FR,
     )
 
-    fig.update_traces(
-        marker=dict(size=5, symbol="square"),
-        hovertemplate="<b>Jour:</b> %{x}<br><b>Année:</b> %{y}<br><b>Nombre:</b> %{marker.color}",
-    )
-
     return fig
 
 
-def restructure_df(df: pd.DataFrame) -> pd.DataFrame:
+def restructure_df(cube_slice: CubeSlice) -> pd.DataFrame:
+
+    # Number of observations by year (rows) and day of the year (columns), from the first to the last year with observations
+    daily_df = cube_slice.count_matrix("day")
+    years_with_observations = np.flatnonzero(daily_df.to_numpy().any(axis=1))
 
-    yearly_df = df.groupby([
-        df['date_time'].dt.year.rename('year'),
-        df['date_time'].dt.month.rename('month'),
-        df['date_time'].dt.day_of_year.rename('day')
-    ]).size().reset_index(name='counts')
+    if len(years_with_observations) == 0:
+        return daily_df.iloc[0:0]
 
-    return yearly_df
\ No newline at end of file
+    return daily_df.iloc[years_with_observations[0] : years_with_observations[-1] + 1]
\ No newline at end of file
@@ -1,6 +1,21 @@
 import plotly.graph_objects as go
 import plotly.express as px
 import pandas as pd
+import numpy as np
+import base64
+from aggregates import CubeSlice, MAP_GRID_SIZES
+
+# Maximum number of markers on the map
+MAX_MARKERS = 1500
+
+# Levels of detail of the map (dimensions of the cube), from the finest to the coarsest
+MAP_LEVELS = ["city", *[f"grid_{size}" for size in MAP_GRID_SIZES], "state"]
+
+# Largest marker area of the geo map (in px): the markers of the coarser levels are scaled down to it
+MAX_MARKER_AREA = 600
+
+# Precision of the coordinates of the compact map figure (about 10 m)
+COORDINATE_DECIMALS = 4
 
 """
 This dictionary contains the latitude and longitude of the centroids of each state in the United States.
@@ -63,29 +78,28 @@ state_centroids = {
 }
 
 
-def draw_map(df: pd.DataFrame, toggle_value: bool) -> go.Figure:
+def draw_map(cube_slice: CubeSlice, toggle_value: bool) -> go.Figure:
     """
-    This function draws a map of the United States with the number of observations by city
-    Each city is represented by a circle, the size of the circle represents the number of observations in that city.
+    This function draws a map of the United States with the number of observations by area (city, grid cell or state)
+    Each area is represented by a circle, the size of the circle represents the number of observations in that area.
 
     If the toggle_value is True, the map will show a satellite view of the United States instead of the normal map.
 
-    This diminish the impact of lag, only the top 1500 cities are shown on the map. This arbitrary limit was set to improve performance.
+    To diminish the impact of lag, the map shows at most MAX_MARKERS circles: when the selected observations come from more cities,
+    they are grouped by the finest grid (or by state) that fits, so that every observation is still represented.
     """
 
-    df_by_city = restructure_df(df)
-
-    if len(df_by_city) > 1500:
-        df_by_city = df_by_city[0:1500]
+    df_by_area = restructure_df(cube_slice)
 
     fig = go.Figure()
 
     if toggle_value:
         fig = px.scatter_mapbox(
-            df_by_city,
-            lat="city_latitude",
-            lon="city_longitude",
-            hover_name="city",
+            df_by_area,
+            lat="latitude",
+            lon="longitude",
+            hover_name="label",
+            hover_data={"latitude": ":.4f", "longitude": ":.4f"},
             size="count",
             color_discrete_sequence=["red"],
             zoom=3.5,
@@ -124,14 +138,15 @@ def draw_map(df: pd.DataFrame, toggle_value: bool) -> go.Figure:
         fig.add_trace(
             go.Scattergeo(
                 locationmode="USA-states",
-                lon=df_by_city["city_longitude"],
-                lat=df_by_city["city_latitude"],
-                text=df_by_city["city"],
-                customdata=df_by_city["count"],
+                lon=df_by_area["longitude"],
+                lat=df_by_area["latitude"],
+                text=df_by_area["label"],
+                customdata=df_by_area["count"],
                 mode="markers",
-                hovertemplate="<b>%{text}</b><br>Nombre: %{customdata} <br>lon: %{lon}, lat: %{lat} <extra></extra>",
+                hovertemplate="<b>%{text}</b><br>Nombre: %{customdata} <br>lon: %{lon:.4f}, lat: %{lat:.4f} <extra></extra>",
                 marker=dict(
-                    size=df_by_city["count"] * 1.5,
+                    size=df_by_area["count"] * 1.5,
+                    sizeref=max(1, df_by_area["count"].max() * 1.5 / MAX_MARKER_AREA) if len(df_by_area) else 1,
                     color="ForestGreen",
                     sizemode="area",
                 ),
@@ -167,15 +182,62 @@ def draw_map(df: pd.DataFrame, toggle_value: bool) -> go.Figure:
     return fig
 
 
-def restructure_df(df: pd.DataFrame) -> pd.DataFrame:
+def compact_map_figure(fig: go.Figure) -> dict:
+    """
+    This function returns the map figure as a dict whose numeric arrays are sent in the binary form of plotly.js (typed arrays):
+    the coordinates rounded to COORDINATE_DECIMALS and stored as float32, the counts and sizes as float32 or uint32.
+    A label shared by all the markers (grid cells) is sent once instead of once per marker.
+    """
+    figure = fig.to_dict()
 
-    df_by_city = (
-        df.groupby(["city_longitude", "city_latitude", "city"])
-        .size()
-        .reset_index(name="count")
-    )
+    for trace in figure["data"]:
+        for key in ["lat", "lon"]:
+            if key in trace and len(trace[key]):
+                trace[key] = typed_array(np.round(np.asarray(trace[key], dtype=float), COORDINATE_DECIMALS), "f4")
+
+        if "customdata" in trace and len(trace["customdata"]):
+            customdata = np.asarray(trace["customdata"])
+            trace["customdata"] = typed_array(customdata, "u4" if np.issubdtype(customdata.dtype, np.integer) else "f4")
+
+        marker = trace.get("marker", {})
+        if "size" in marker and np.ndim(marker["size"]) and len(marker["size"]):
+            marker["size"] = typed_array(marker["size"], "f4")
+
+        for key in ["text", "hovertext"]:
+            if key in trace and np.ndim(trace[key]) and len(trace[key]) and len(set(trace[key])) == 1:
+                trace[key] = trace[key][0]
+
+    return figure
+
+
+def typed_array(values, dtype: str) -> dict:
+    """
+    This function encodes the values as a typed array of plotly.js: the base64 of their little-endian binary values, and their shape.
+    """
+    array = np.ascontiguousarray(values, dtype=np.dtype(dtype).newbyteorder("<"))
+    encoded = {"dtype": dtype, "bdata": base64.b64encode(array.tobytes()).decode("ascii")}
+    if array.ndim > 1:
+        encoded["shape"] = ",".join(str(size) for size in array.shape)
+    return encoded
+
+
+def restructure_df(cube_slice: CubeSlice) -> pd.DataFrame:
+
+    # Number of observations by area (longitude, latitude, label), at the finest level of detail with at most MAX_MARKERS areas
+    for level in MAP_LEVELS:
+        df_by_area = cube_slice.count_by(level)
+        if len(df_by_area) <= MAX_MARKERS:
+            break
+
+    if level == "city":
+        df_by_area = df_by_area.rename(columns={"city_longitude": "longitude", "city_latitude": "latitude", "city": "label"})
+    elif level == "state":
+        df_by_area = df_by_area.rename(columns={"state": "label"})
+    else:
+        df_by_area["label"] = f"Zone de {level.removeprefix('grid_')}°"
 
-    df_by_city.sort_values(by="count", ascending=False, inplace=True)
+    # Stable sort, so that the areas with the same count keep the same order (also in assets/clientside_filtering.js)
+    df_by_area.sort_values(by="count", ascending=False, kind="stable", inplace=True)
 
-    return df_by_city
+    return df_by_area
 
@@ -2,9 +2,10 @@ import plotly.graph_objects as go
 import plotly.express as px
 
 import pandas as pd
+from aggregates import CubeSlice
 
 
-def draw_sentiment_analysis_graph(df) -> go.Figure:
+def draw_sentiment_analysis_graph(cube_slice: CubeSlice) -> go.Figure:
 
     """
     This function draws a pie chart of the sentiment analysis of the text summary of the observations.
@@ -12,7 +13,7 @@ def draw_sentiment_analysis_graph(df) -> go.Figure:
     There are 3 possible sentiments: "positif", "négatif", "neutre", pre-computed by the sentiment analysis preprocessing step.
     """
 
-    sentiment_df = restructure_df(df)
+    sentiment_df = restructure_df(cube_slice)
 
     # Custom color map for the sentiment categories
     color_map = {
@@ -54,7 +55,7 @@ def draw_sentiment_analysis_graph(df) -> go.Figure:
     return fig
 
 
-def restructure_df(df: pd.DataFrame) -> pd.DataFrame:
+def restructure_df(cube_slice: CubeSlice) -> pd.DataFrame:
 
-    sentiment_df = df.groupby("sentiment").size().reset_index(name="count")
+    sentiment_df = cube_slice.count_by("sentiment")
     return sentiment_df
@@ -1,10 +1,12 @@
 import plotly.graph_objects as go
+import numpy as np
 import pandas as pd
-from collections import Counter
 import plotly.express as px
 
+from token_index import TokenIndex
 
-def draw_word_frequency_graph(df: pd.DataFrame) -> go.Figure:
+
+def draw_word_frequency_graph(tokens: TokenIndex, mask: np.ndarray) -> go.Figure:
 
     """
     This function draws a horizontal bar graph of the top 10 most common words in the text summary of the observations.
@@ -12,7 +14,7 @@ def draw_word_frequency_graph(df: pd.DataFrame) -> go.Figure:
     The words are counted after the NLP preprocessing step, which removes stopwords and punctuation, and aggregates the words using lemmatization.
     """
 
-    top_words_df = restructure_df(df)
+    top_words_df = restructure_df(tokens, mask)
 
     fig = px.bar(top_words_df, x="Count", y="Word", orientation="h", color_discrete_sequence=["#8fbc8f"])
 
@@ -30,15 +32,10 @@ def draw_word_frequency_graph(df: pd.DataFrame) -> go.Figure:
     return fig
 
 
-def restructure_df(df: pd.DataFrame) -> pd.DataFrame:
-
-    # Count the occurrences of each word in the summary
-    all_words = " ".join(df["summary"]).lower().split()
-    word_counts = Counter(all_words)
+def restructure_df(tokens: TokenIndex, mask: np.ndarray) -> pd.DataFrame:
 
-    # Get the top 10 most common words and their counts
-    # Convert to DataFrame
-    most_common_words = word_counts.most_common(10)
-    top_words_df = pd.DataFrame(most_common_words, columns=["Word", "Count"])
+    # Sum the word counts of the selected observations (precomputed by the preprocessing, see token_index.py)
+    # and get the top 10 most common words and their counts
+    top_words_df = tokens.top_words(mask, 10)
 
     return top_words_df
@@ -0,0 +1,248 @@
+# This file contains the lightweight data access used by the Dash application: loading the processed data and the events,
+# and filtering the observations. It does not depend on the NLP stack (nltk, textblob), which is only imported by preprocess.py.
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+import os
+
+PROCESSED_CSV_PATH = "assets/data/processed_data.csv"
+PROCESSED_FEATHER_PATH = "assets/data/processed_data.feather"
+
+# Compact types of the processed columns, stored in the Feather artifact and kept in memory by the application
+# - The low-cardinality columns are categorical: small integer codes per row and one table of distinct values.
+# - Each city (location, name and state) has a dense integer id, assigned by the preprocessing (see assign_city_ids).
+# - The summaries are Arrow strings: one contiguous character buffer with offsets instead of one Python object per row.
+PROCESSED_SCHEMA = {
+    "row_hash": "uint64",
+    "date_time": "datetime64[ns]",
+    "duration": "int64",
+    "shape": "category",
+    "sentiment": "category",
+    "state": "category",
+    "city": "category",
+    "summary": "string[pyarrow]",
+    "city_latitude": "float32",
+    "city_longitude": "float32",
+    "city_id": "int32",
+}
+
+# Columns of PROCESSED_SCHEMA that may be missing from processed data saved by older versions (they are added by load_data)
+OPTIONAL_COLUMNS = ["city_id"]
+
+# Columns identifying a city, numbered by assign_city_ids
+CITY_COLUMNS = ["city_longitude", "city_latitude", "city", "state"]
+
+# Arrow strings are read as pandas Arrow-backed strings, so that the buffers of the memory-mapped file are used as is
+ARROW_TYPES_MAPPER = {pa.string(): pd.StringDtype("pyarrow"), pa.large_string(): pd.StringDtype("pyarrow")}.get
+
+
+def load_data() -> pd.DataFrame:
+    """
+    This function loads the processed data, with the compact types of PROCESSED_SCHEMA, and reports its memory footprint.
+
+    The typed Feather artifact is memory-mapped when it is up to date (not older than the CSV file and matching PROCESSED_SCHEMA),
+    which avoids parsing text and casting the columns on every start of the application. Otherwise, the CSV file is parsed.
+    """
+
+    if is_processed_artifact_fresh():
+        table = feather.read_table(PROCESSED_FEATHER_PATH, memory_map=True)
+        df = table.to_pandas(split_blocks=True, types_mapper=ARROW_TYPES_MAPPER)
+
+        if matches_processed_schema(df):
+            df = with_city_ids(df)
+            print_memory_footprint(df)
+            return df
+
+        print(f">>> {PROCESSED_FEATHER_PATH} does not match the expected schema, loading {PROCESSED_CSV_PATH}")
+
+    df = pd.read_csv(PROCESSED_CSV_PATH, index_col=0).reset_index(drop=True)
+
+    # Convert columns to the right type
+    df["date_time"] = pd.to_datetime(df["date_time"], errors="coerce")
+    # Summaries left empty by the text cleaning are read back as missing values
+    df["summary"] = df["summary"].fillna("").astype(str)
+
+    df = with_city_ids(df)
+    df = cast_processed_types(df)
+    print_memory_footprint(df)
+    return df
+
+
+def matches_processed_schema(df: pd.DataFrame) -> bool:
+    """
+    This function checks that the DataFrame has the columns of PROCESSED_SCHEMA (except OPTIONAL_COLUMNS) with their types,
+    and no other categorical column, whose unexpected codes could make the groupby of the categories explode.
+    """
+    required = [column for column in PROCESSED_SCHEMA if column not in OPTIONAL_COLUMNS]
+    if any(column not in df for column in required):
+        return False
+
+    if any(df[column].dtype != dtype for column, dtype in PROCESSED_SCHEMA.items() if column in df):
+        return False
+
+    return not any(isinstance(df[column].dtype, pd.CategoricalDtype) for column in df if column not in PROCESSED_SCHEMA)
+
+
+def is_processed_artifact_fresh() -> bool:
+    """
+    This function checks that the Feather artifact exists and is not older than the processed CSV file.
+    """
+    if not os.path.exists(PROCESSED_FEATHER_PATH):
+        return False
+
+    if not os.path.exists(PROCESSED_CSV_PATH):
+        return True
+
+    return os.path.getmtime(PROCESSED_FEATHER_PATH) >= os.path.getmtime(PROCESSED_CSV_PATH)
+
+
+def assign_city_ids(df: pd.DataFrame) -> pd.Series:
+    """
+    This function returns the dense integer id of the city (CITY_COLUMNS) of each observation, the ids following the order of the cities.
+    The observations without a location have the id -1.
+    """
+    city_ids = df.groupby(CITY_COLUMNS, observed=True).ngroup()
+    return city_ids.fillna(-1).astype("int32")
+
+
+def with_city_ids(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    This function adds the city ids to processed data saved before they were assigned by the preprocessing.
+    """
+    if "city_id" not in df:
+        df["city_id"] = assign_city_ids(df)
+    return df
+
+
+def city_table(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    This function returns the city dimension table: the location, name and state of each city id (index), in the order of the ids.
+    """
+    located = df[df["city_id"] >= 0]
+    return located.drop_duplicates("city_id").set_index("city_id").sort_index()[CITY_COLUMNS]
+
+
+def cast_processed_types(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    This function casts the processed columns to the types of PROCESSED_SCHEMA.
+    """
+    return df.astype({column: dtype for column, dtype in PROCESSED_SCHEMA.items() if column in df})
+
+
+def memory_footprint(df: pd.DataFrame) -> pd.Series:
+    """
+    This function returns the memory used by each column of the DataFrame, in MB (including the strings and the category tables).
+    """
+    return df.memory_usage(deep=True, index=False) / 1024**2
+
+
+def print_memory_footprint(df: pd.DataFrame):
+    """
+    This function prints the total memory footprint of the DataFrame and the three largest columns.
+    """
+    footprint = memory_footprint(df)
+    largest = ", ".join(f"{column}: {size:.1f} MB" for column, size in footprint.nlargest(3).items())
+    print(f">>> Loaded {len(df)} observations, {footprint.sum():.1f} MB in memory ({largest})")
+
+
+def load_events() -> pd.DataFrame:
+
+    events_db = pd.read_csv("assets/data/events.csv")
+    return events_db
+
+
+def filter_by_shapes(df: pd.DataFrame, shapes: list[str]) -> pd.DataFrame:
+
+    # Keys: subset of "light", "circle", "triangle", "fireball", "other"
+
+    if not shapes:
+        return df
+
+    return df[df["shape"].isin(shapes)]
+
+
+def filter_by_duration(df: pd.DataFrame, duration: str = "all"):
+
+    # Keys : "short" OR "long" OR "all"
+
+    if duration == "all":
+        return df
+
+    if duration == "short":
+        return df[df["duration"] < 60]
+
+    if duration == "long":
+        return df[df["duration"] >= 60]
+
+    return df
+
+
+def filter_by_decade(df: pd.DataFrame, decade: str = "Toutes") -> pd.DataFrame:
+
+    # Keys : "Pre-1980" OR "1980" OR "1990" OR "2000" OR "2010" OR "Toutes"
+
+    if decade == "Toutes":
+        return df
+
+    if decade == "Pre-1980":
+        return df[df["date_time"].dt.year < 1980]
+
+    min_year = int(decade)
+    max_year = min_year + 9
+    return df[
+        (df["date_time"].dt.year >= min_year) & (df["date_time"].dt.year <= max_year)
+    ]
+
+
+def build_filter_index(df: pd.DataFrame) -> dict:
+    """
+    This function precomputes one boolean mask per value of each filter of the filter box, once at the start of the application.
+
+    The masks follow the same rules as filter_by_shapes, filter_by_duration and filter_by_decade:
+    - "shape": one mask per shape of the data
+    - "duration": the "short" (< 60 seconds) and "long" masks
+    - "decade": the "Pre-1980" mask and one mask per decade of the data (e.g. "1990" for 1990 to 1999)
+    """
+    shapes = df["shape"].astype("category")
+    shape_codes = shapes.cat.codes.to_numpy()
+    durations = df["duration"].to_numpy()
+    years = df["date_time"].dt.year.to_numpy()
+
+    decade_masks = {"Pre-1980": years < 1980}
+    for decade in np.unique(years[~np.isnan(years)] // 10 * 10).astype(int):
+        decade_masks[str(decade)] = (years >= decade) & (years <= decade + 9)
+
+    return {
+        "n_rows": len(df),
+        "shape": {shape: shape_codes == code for code, shape in enumerate(shapes.cat.categories)},
+        "duration": {"short": durations < 60, "long": durations >= 60},
+        "decade": decade_masks,
+    }
+
+
+def filter_mask(filter_index: dict, shapes: list[str], duration: str = "all", decade: str = "Toutes") -> np.ndarray:
+    """
+    This function combines the precomputed masks of the filter index into the boolean mask of the selected observations.
+
+    It gives the same selection as applying filter_by_shapes, filter_by_duration and filter_by_decade, without scanning the data.
+    """
+    n_rows = filter_index["n_rows"]
+    mask = np.ones(n_rows, dtype=bool)
+    no_rows = np.zeros(n_rows, dtype=bool)
+
+    if shapes:
+        shapes_mask = no_rows.copy()
+        for shape in shapes:
+            shapes_mask |= filter_index["shape"].get(shape, no_rows)
+        mask &= shapes_mask
+
+    # Like filter_by_duration, an unknown duration key does not filter
+    if duration in filter_index["duration"]:
+        mask &= filter_index["duration"][duration]
+
+    if decade != "Toutes":
+        mask &= filter_index["decade"].get(decade, no_rows)
+
+    return mask
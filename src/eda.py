@@ -1,7 +1,7 @@
 import pandas as pd
 
-# load the data
-df = pd.read_csv("assets/data/nuforc_reports.csv")
+# load the data (read directly from the zip archive, which is no longer extracted by the preprocessing)
+df = pd.read_csv("assets/data/nuforc_reports.zip")
 
 df_preprocessed = pd.read_csv("assets/data/processed_data.csv")
 
@@ -0,0 +1,176 @@
+# This file contains the cache of the figures rendered by the callbacks of the Dash application.
+# The figures are stored as serialized JSON (UTF-8 bytes), keyed by the normalized state of the filter box, in a least recently used (LRU) cache
+# bounded by the total size of the stored figures. The cache is shared by the threads of a worker (guarded by a lock) and can be
+# backed by a directory shared by all the workers, in which every rendered figure is also written.
+
+from collections import OrderedDict
+import hashlib
+import json
+import os
+import tempfile
+import threading
+
+import plotly.graph_objects as go
+import plotly.io as pio
+
+
+def normalize_filters(shapes: list[str], duration: str, decade: str) -> tuple:
+    """
+    This function returns the filter box state as a hashable key, independent of the order in which the shapes were checked.
+    """
+    return (tuple(sorted(shapes or [])), duration, decade)
+
+
+class FigureCache:
+    """
+    This class is a thread-safe LRU cache of serialized figures, which evicts the least recently used figures above max_bytes.
+
+    When disk_dir is given, the figures are also written to that directory and read from it on a memory miss,
+    so that a figure rendered by one worker is reused by the others. The version (of the code and of the data) prefixes the file names,
+    so that the figures of a previous version are never read, and their files are deleted when the cache is created.
+    """
+
+    def __init__(self, max_bytes: int, disk_dir: str = None, version: str = ""):
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self.version = version
+
+        self.entries = OrderedDict()
+        self.total_bytes = 0
+        self.lock = threading.Lock()
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+            self.remove_other_versions()
+
+    def get(self, key) -> dict:
+        """
+        This method returns the cached figure (as a dict, ready to be sent by Dash), or None when it is not cached.
+        """
+        with self.lock:
+            figure_json = self.entries.get(key)
+            if figure_json is not None:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return json.loads(figure_json)
+
+        figure_json = self.read_disk(key)
+
+        with self.lock:
+            if figure_json is None:
+                self.misses += 1
+                return None
+
+            self.disk_hits += 1
+            self.store(key, figure_json)
+
+        return json.loads(figure_json)
+
+    def put(self, key, figure: go.Figure | dict) -> dict:
+        """
+        This method caches the serialized figure and returns it as a dict, like the figures returned by get().
+        """
+        figure_json = pio.to_json(figure, validate=False).encode("utf-8")
+
+        with self.lock:
+            self.store(key, figure_json)
+
+        self.write_disk(key, figure_json)
+        return json.loads(figure_json)
+
+    def store(self, key, figure_json: bytes):
+        """
+        This method adds the figure to the memory tier and evicts the least recently used figures above max_bytes.
+        It must be called with the lock held.
+        """
+        if key in self.entries:
+            self.total_bytes -= len(self.entries.pop(key))
+
+        # A figure larger than the whole cache is not kept in memory
+        if len(figure_json) > self.max_bytes:
+            return
+
+        self.entries[key] = figure_json
+        self.total_bytes += len(figure_json)
+
+        while self.total_bytes > self.max_bytes:
+            _, evicted_json = self.entries.popitem(last=False)
+            self.total_bytes -= len(evicted_json)
+            self.evictions += 1
+
+    def disk_path(self, key) -> str:
+        """
+        This method returns the path of the file of the figure in the disk tier.
+        """
+        digest = hashlib.sha1(repr(key).encode()).hexdigest()
+        return os.path.join(self.disk_dir, f"{self.version_prefix()}-{digest}.json")
+
+    def version_prefix(self) -> str:
+        """
+        This method returns the prefix of the file names of the figures of this version in the disk tier.
+        """
+        return hashlib.sha1(self.version.encode()).hexdigest()[:16]
+
+    def remove_other_versions(self):
+        """
+        This method deletes the figures of the disk tier written by other versions.
+        """
+        prefix = f"{self.version_prefix()}-"
+        removed = 0
+        for name in os.listdir(self.disk_dir):
+            if name.endswith(".json") and not name.startswith(prefix):
+                try:
+                    os.remove(os.path.join(self.disk_dir, name))
+                    removed += 1
+                except FileNotFoundError:
+                    # Already deleted by another worker
+                    pass
+
+        if removed:
+            print(f">>> {removed} figures of other versions removed from {self.disk_dir}")
+
+    def read_disk(self, key) -> bytes:
+        """
+        This method returns the serialized figure from the disk tier, or None when it is disabled or the figure was never written.
+        """
+        if not self.disk_dir:
+            return None
+
+        try:
+            with open(self.disk_path(key), "rb") as file:
+                return file.read()
+        except FileNotFoundError:
+            return None
+
+    def write_disk(self, key, figure_json: bytes):
+        """
+        This method writes the serialized figure to the disk tier.
+        The file is written under a temporary name and then renamed, so that other workers never read a partial file.
+        """
+        if not self.disk_dir:
+            return
+
+        descriptor, temporary_path = tempfile.mkstemp(dir=self.disk_dir, suffix=".tmp")
+        with os.fdopen(descriptor, "wb") as file:
+            file.write(figure_json)
+        os.replace(temporary_path, self.disk_path(key))
+
+    def stats(self) -> dict:
+        """
+        This method returns the counters and the size of the cache.
+        """
+        with self.lock:
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self.entries),
+                "bytes": self.total_bytes,
+                "max_bytes": self.max_bytes,
+            }
@@ -0,0 +1,57 @@
+# This file contains the partial updates of the figures sent by the callbacks of the Dash application.
+# When the filters change, most of a figure (layout, geo configuration, state initials of the map, events of the cultural events graph)
+# stays the same and only the data of the traces changes. Instead of the full figure, the callbacks send a Dash Patch
+# which only replaces the values that differ from the figure displayed in the browser.
+
+from dash import Patch, no_update
+
+
+def figure_changes(previous, current, path: tuple = ()) -> list[tuple]:
+    """
+    This function returns the changes between two serialized figures, as (path, new value) pairs.
+
+    Dicts with the same keys and lists of dicts with the same length (the traces, the shapes and the annotations) are compared
+    element by element, any other value (the data arrays for example) is replaced as a whole when it differs.
+    """
+    if isinstance(previous, dict) and isinstance(current, dict) and previous.keys() == current.keys():
+        return [change for key in current for change in figure_changes(previous[key], current[key], path + (key,))]
+
+    if (
+        isinstance(previous, list)
+        and isinstance(current, list)
+        and len(previous) == len(current)
+        and all(isinstance(item, dict) for item in previous + current)
+    ):
+        return [change for index in range(len(current)) for change in figure_changes(previous[index], current[index], path + (index,))]
+
+    if previous == current:
+        return []
+
+    return [(path, current)]
+
+
+def figure_update(previous: dict, current: dict):
+    """
+    This function returns the update of the graph displaying the previous figure to the current figure:
+    the full figure when the previous figure is unknown or when its structure changed (different traces or layout keys),
+    no_update when the figures are identical, and otherwise a Patch of the changed values.
+    """
+    if previous is None:
+        return current
+
+    changes = figure_changes(previous, current)
+    if not changes:
+        return no_update
+
+    # The list of traces or the layout is replaced as a whole, the Patch would be as large as the figure
+    if any(len(path) < 2 for path, _ in changes):
+        return current
+
+    patch = Patch()
+    for path, value in changes:
+        target = patch
+        for key in path[:-1]:
+            target = target[key]
+        target[path[-1]] = value
+
+    return patch
@@ -0,0 +1,18 @@
+# This file contains the configuration of gunicorn, used by the startCommand of render.yaml:
+#   gunicorn --chdir src --config src/gunicorn.conf.py app:server
+#
+# The application is loaded once in the master process before the workers are forked (preload), so that the workers share its memory
+# (imported libraries, data, aggregate cube and initial figures) instead of each loading its own copy. The processed data itself is
+# memory-mapped from the Feather file (see data_access.load_data), so its pages are shared with the page cache in both modes.
+# The number of workers is given by the WEB_CONCURRENCY environment variable (default of gunicorn).
+
+import gc
+
+preload_app = True
+
+
+def when_ready(server):
+    # The objects of the loaded application are moved to a permanent generation ignored by the garbage collector.
+    # Otherwise, the collections in the workers write to every object (and copy the pages shared with the master).
+    gc.freeze()
+    server.log.info(f"Application preloaded, {gc.get_freeze_count()} objects frozen")
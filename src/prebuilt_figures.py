@@ -0,0 +1,262 @@
+# This file contains the store of prebuilt figures: the responses of the figure callbacks for every state of the filter box and of the geo toggle,
+# rendered once at deploy time (see the buildCommand of render.yaml) and compressed with gzip and brotli.
+# The responses are stored by the hash of their content (identical responses are stored once) and a manifest gives the hash of each request.
+#
+# At request time, the application answers the figure callbacks directly from the precompressed files, without any pandas or plotly work.
+# The store is ignored (and the figures are computed live) when the code or the processed data changed since it was built.
+#
+# Usage (from the src folder): python prebuilt_figures.py --workers 4
+
+from concurrent.futures import ProcessPoolExecutor
+from itertools import combinations
+import argparse
+import glob
+import gzip
+import hashlib
+import importlib.metadata
+import json
+import os
+
+from flask import Response
+
+import data_access
+
+try:
+    import brotli
+except ImportError:
+    # Without the brotli package, only the gzip files are written and served
+    brotli = None
+
+PREBUILT_DIR = "prebuilt"
+MANIFEST_PATH = os.path.join(PREBUILT_DIR, "manifest.json")
+
+# Files that change the figures or the responses: the code of the application and of the stores, the events of the cultural events graph,
+# and the processed data
+SOURCE_FILES = [
+    "app.py",
+    "aggregates.py",
+    "data_access.py",
+    "token_index.py",
+    "figure_cache.py",
+    "figure_patch.py",
+    "prebuilt_figures.py",
+    "components/*.py",
+    "assets/data/events.csv",
+]
+
+# Installed libraries whose version changes the figures or the format of the responses
+# (dash_bootstrap_templates gives the LUX template of the figures, dash_bootstrap_components renders the layout)
+SOURCE_LIBRARIES = ["dash", "plotly", "pandas", "numpy", "dash_bootstrap_templates", "dash_bootstrap_components"]
+
+
+def sources_fingerprint() -> str:
+    """
+    This function returns the hash of the code, of the versions of the libraries and of the processed data files,
+    which identifies the figures that the application draws.
+    """
+    paths = sorted(path for pattern in SOURCE_FILES for path in glob.glob(pattern))
+    paths += [path for path in (data_access.PROCESSED_FEATHER_PATH, data_access.PROCESSED_CSV_PATH) if os.path.exists(path)]
+
+    fingerprint = hashlib.sha256()
+    for library in SOURCE_LIBRARIES:
+        fingerprint.update(f"{library}=={importlib.metadata.version(library)}".encode())
+
+    for path in paths:
+        fingerprint.update(path.encode())
+        with open(path, "rb") as file:
+            for block in iter(lambda: file.read(1024 * 1024), b""):
+                fingerprint.update(block)
+
+    return fingerprint.hexdigest()
+
+
+def request_key(output: str, input_values: list) -> str:
+    """
+    This function returns the key of a callback request in the manifest: the outputs and the values of the inputs.
+    """
+    return json.dumps([output, input_values], separators=(",", ":"), ensure_ascii=False)
+
+
+class PrebuiltStore:
+    """
+    This class answers the callback requests from the precompressed responses of the store, when the store is up to date.
+    """
+
+    def __init__(self, directory: str = PREBUILT_DIR):
+        self.directory = directory
+        self.responses = {}
+
+        manifest_path = os.path.join(directory, "manifest.json")
+        if not os.path.exists(manifest_path):
+            return
+
+        with open(manifest_path, encoding="utf-8") as file:
+            manifest = json.load(file)
+
+        if manifest["fingerprint"] != sources_fingerprint():
+            print(f">>> The prebuilt figures of {directory} are out of date, the figures will be computed live")
+            return
+
+        self.responses = manifest["responses"]
+        print(f">>> {len(self.responses)} prebuilt figure responses loaded from {directory}")
+
+    def response(self, output: str, input_values: list, accept_encodings) -> Response:
+        """
+        This method returns the prebuilt response of the callback request, compressed with the best encoding accepted by the client,
+        or None when the request is not in the store.
+        """
+        digest = self.responses.get(request_key(output, input_values))
+        if digest is None:
+            return None
+
+        path = os.path.join(self.directory, digest)
+        headers = {"Vary": "Accept-Encoding"}
+
+        if "br" in accept_encodings and os.path.exists(f"{path}.json.br"):
+            headers["Content-Encoding"] = "br"
+            with open(f"{path}.json.br", "rb") as file:
+                body = file.read()
+        elif "gzip" in accept_encodings:
+            headers["Content-Encoding"] = "gzip"
+            with open(f"{path}.json.gz", "rb") as file:
+                body = file.read()
+        else:
+            with gzip.open(f"{path}.json.gz", "rb") as file:
+                body = file.read()
+
+        return Response(body, mimetype="application/json", headers=headers)
+
+
+def write_response(directory: str, body: bytes) -> str:
+    """
+    This function writes the response to the store, compressed with gzip and brotli, and returns the hash of its content.
+    """
+    digest = hashlib.sha256(body).hexdigest()
+    path = os.path.join(directory, digest)
+
+    if not os.path.exists(f"{path}.json.gz"):
+        with open(f"{path}.json.gz", "wb") as file:
+            file.write(gzip.compress(body, compresslevel=9, mtime=0))
+
+        if brotli is not None:
+            with open(f"{path}.json.br", "wb") as file:
+                file.write(brotli.compress(body, quality=11))
+
+    return digest
+
+
+def filter_box_states() -> list:
+    """
+    This function returns every state of the filter box: each subset of shapes, duration and decade.
+    """
+    import figure_cache
+    from components.filter_box import SHAPE_LABELS, DURATION_LABELS, DECADES
+
+    shape_subsets = [list(subset) for size in range(len(SHAPE_LABELS) + 1) for subset in combinations(SHAPE_LABELS, size)]
+    return [
+        list(figure_cache.normalize_filters(shapes, duration, decade))
+        for shapes in shape_subsets
+        for duration in DURATION_LABELS
+        for decade in DECADES
+    ]
+
+
+def build_requests(selection: list) -> list:
+    """
+    This function returns the requests of the figure callbacks (the callbacks with the selection store as input) for the selection,
+    in the format sent by the browser. The states (keys of the displayed figures) are empty, so that the responses are full figures.
+    """
+    import app
+
+    requests = []
+    for dependency in app.server.test_client().get("/_dash-dependencies").json:
+        inputs = dependency["inputs"]
+        if not any(item["id"] == "selection" for item in inputs):
+            continue
+
+        outputs = [{"id": output.split(".")[0], "property": output.split(".")[1]} for output in dependency["output"].strip(".").split("...")]
+        toggle_values = [False, True] if any(item["id"] == "geo_toggler" for item in inputs) else [None]
+
+        for toggle_value in toggle_values:
+            values = {"selection": selection, "geo_toggler": toggle_value}
+            requests.append(
+                {
+                    "output": dependency["output"],
+                    "outputs": outputs if len(outputs) > 1 else outputs[0],
+                    "inputs": [{"id": item["id"], "property": item["property"], "value": values[item["id"]]} for item in inputs],
+                    "state": [{"id": item["id"], "property": item["property"], "value": None} for item in dependency["state"]],
+                    "changedPropIds": [],
+                }
+            )
+
+    return requests
+
+
+def build_selection(selection: list) -> dict:
+    """
+    This function renders the responses of the figure callbacks for the selection and writes them to the store.
+    It returns the hash of each response by request key, and the keys and status codes of the requests that failed.
+    """
+    import app
+
+    client = app.server.test_client()
+    responses = {}
+    failures = []
+    for request in build_requests(selection):
+        response = client.post("/_dash-update-component", json=request, headers={"Accept-Encoding": "identity"})
+        key = request_key(request["output"], [item["value"] for item in request["inputs"]])
+
+        # A callback that fails is left to the live computation
+        if response.status_code != 200:
+            failures.append((key, response.status_code))
+            continue
+
+        responses[key] = write_response(PREBUILT_DIR, response.get_data())
+
+    return responses, failures
+
+
+def build_store(n_workers: int):
+    """
+    This function renders the figures of every state of the filter box and writes the store and its manifest.
+    """
+    # The application is imported (and the data loaded) before the worker processes are started, so that they share it
+    import app
+
+    os.makedirs(PREBUILT_DIR, exist_ok=True)
+    # Without a manifest, the application does not use the store while it is built
+    if os.path.exists(MANIFEST_PATH):
+        os.remove(MANIFEST_PATH)
+    app.prebuilt_store.responses = {}
+
+    selections = filter_box_states()
+    print(f">>> Rendering the figures of {len(selections)} filter box states with {n_workers} workers")
+
+    responses = {}
+    failures = []
+    with ProcessPoolExecutor(max_workers=n_workers) as executor:
+        for index, (selection_responses, selection_failures) in enumerate(executor.map(build_selection, selections)):
+            responses.update(selection_responses)
+            failures += selection_failures
+            if (index + 1) % 50 == 0:
+                print(f">>> {index + 1}/{len(selections)} filter box states rendered")
+
+    with open(MANIFEST_PATH, "w", encoding="utf-8") as file:
+        json.dump({"fingerprint": sources_fingerprint(), "responses": responses}, file)
+
+    n_files = len(set(responses.values()))
+    print(f">>> {len(responses)} responses ({n_files} distinct) written to {PREBUILT_DIR}")
+
+    # The failed requests are computed live, the store is incomplete
+    if failures:
+        print(f">>> {len(failures)} requests failed and are missing from the store:")
+        for key, status_code in failures:
+            print(f"    {status_code} {key}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Render the figures of every state of the filter box to the prebuilt store.")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Number of processes rendering the figures.")
+    args = parser.parse_args()
+
+    build_store(args.workers)
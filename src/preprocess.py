@@ -1,39 +1,103 @@
 import pandas as pd
+import pyarrow.feather as feather
 from textblob import TextBlob
+from textblob.en import sentiment as pattern_sentiment
 import nltk
 from nltk.corpus import stopwords
 from nltk.tokenize import word_tokenize
 from nltk.stem import WordNetLemmatizer
 import zipfile
 import csv
+import hashlib
+import importlib.metadata
+import json
 import os
-from preprocess_constants import TIME_KEYWORDS, TIME_VALUES
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from functools import lru_cache, partial
+from token_index import TOKEN_INDEX_PATH, build_token_index
+from preprocess_constants import TIME_KEYWORDS, TIME_VALUES, COLUMNS_TO_KEEP, USA_NAME_VARIANTS, TEXT_ENGINE_CORPUS
+
+# The loading and filtering functions are also exposed here (preprocess.load_data(), preprocess.filter_by_shapes(), ...)
+from data_access import (
+    PROCESSED_CSV_PATH,
+    PROCESSED_FEATHER_PATH,
+    assign_city_ids,
+    cast_processed_types,
+    load_data,
+    load_events,
+    filter_by_shapes,
+    filter_by_duration,
+    filter_by_decade,
+)
+
+# Settings of the previous run (engines and hash of the preprocessing code), saved with the processed data for the incremental mode
+PROCESSED_SETTINGS_PATH = "assets/data/processed_settings.json"
+
+# Files and libraries that change the processed duration, summary and sentiment of a report
+PREPROCESSING_SOURCE_FILES = ["preprocess.py", "preprocess_constants.py"]
+PREPROCESSING_LIBRARIES = ["nltk", "textblob"]
+
+
+def load_raw_data(zip_file_path="assets/data/nuforc_reports.zip", chunk_size=100_000) -> pd.DataFrame:
+    """
+    This function streams the raw reports directly out of the zip archive, without extracting it to disk.
+
+    Each chunk of chunk_size rows is reduced right away (rows with missing values are dropped, then the columns not in COLUMNS_TO_KEEP
+    and the rows outside of the USA), so the memory used grows with the retained rows only.
+    Missing values are checked on all the columns before the projection, as when the whole file was loaded.
 
+    The row counts before filtering are stored in df.attrs to be reported by preprocess().
+    """
+    n_rows_original = 0
+    n_rows_complete = 0
+    chunks = []
 
-def load_raw_data(zip_file_path="assets/data/nuforc_reports.zip") -> pd.DataFrame:
-    # unzip the file
     with zipfile.ZipFile(zip_file_path, "r") as z:
-        z.extractall("assets/data")
+        with z.open("nuforc_reports.csv") as f:
+            for chunk in pd.read_csv(f, chunksize=chunk_size):
+                n_rows_original += chunk.shape[0]
 
-    file_path = "assets/data/nuforc_reports.csv"
-    return pd.read_csv(file_path)
+                chunk = chunk.dropna()
+                n_rows_complete += chunk.shape[0]
 
+                chunk = chunk[COLUMNS_TO_KEEP]
+                chunks.append(chunk[chunk["country"].isin(USA_NAME_VARIANTS)])
 
-def load_data() -> pd.DataFrame:
+    df = pd.concat(chunks)
+    df.attrs["n_rows_original"] = n_rows_original
+    df.attrs["n_rows_complete"] = n_rows_complete
 
-    df = pd.read_csv("assets/data/processed_data.csv")
+    return df
 
-    # Convert columns to the right type
-    df["date_time"] = pd.to_datetime(df["date_time"], errors="coerce")
-    df["summary"] = df["summary"].astype(str)
-    df["duration"] = df["duration"].astype(int)
 
-    return df
+def save_processed_data(df: pd.DataFrame, settings: dict):
+    """
+    This function saves the processed data to a CSV file and to a typed, columnar Feather file, the token index of the summaries,
+    and the settings that produced the data (see preprocessing_settings).
+
+    The Feather file is written uncompressed so that it can be memory-mapped by load_data().
+    """
+    if os.path.exists(PROCESSED_CSV_PATH):
+        os.remove(PROCESSED_CSV_PATH)
+
+    df.to_csv(PROCESSED_CSV_PATH, quoting=csv.QUOTE_NONNUMERIC)
+    print(f">>> Data has been processed and saved to {PROCESSED_CSV_PATH}")
 
-def load_events() -> pd.DataFrame:
+    # Written after the CSV file, so that the artifact is considered up to date
+    typed_df = cast_processed_types(df).reset_index(drop=True)
+    feather.write_feather(typed_df, PROCESSED_FEATHER_PATH, compression="uncompressed")
+    print(f">>> Typed data has been saved to {PROCESSED_FEATHER_PATH}")
 
-    events_db = pd.read_csv("assets/data/events.csv")
-    return events_db
+    # Written after the data files, in the order of the rows of the Feather file (see token_index.load_token_index)
+    build_token_index(typed_df["summary"]).save(TOKEN_INDEX_PATH)
+    print(f">>> Token index of the summaries has been saved to {TOKEN_INDEX_PATH}")
+
+    # Written last, so that the settings only describe complete processed data
+    with open(PROCESSED_SETTINGS_PATH, "w") as file:
+        json.dump(settings, file, indent=2)
 
 
 def preprocess_raw_text(text: str, stop_words, lemmatizer) -> str:
@@ -54,6 +118,78 @@ def preprocess_raw_text(text: str, stop_words, lemmatizer) -> str:
     return " ".join(filtered_words)
 
 
+# Single-pass emulation of the splits made by word_tokenize that matter for the alphabetic tokens:
+# punctuation, final periods, ellipses, dashes, commas and colons (except in numbers), quotes, contractions and a few fused words
+FAST_TOKEN_SEPARATORS = re.compile(
+    r"""''|--|[;@#$%&?!*\[\](){}<>"«»“”‘’„`\u2012-\u2015]"""
+    r"|\.{2,}"
+    r"|[:,](?!\d)"
+    r"""|(?<!\.)\.(?=[\]\)}>"']*(?:\s|$))"""
+    r"""|(?<=[^'\s])(?:n't|'(?:s|m|d|ll|re|ve)?)(?=[\s;@#$%&?!*\[\](){}<>"«»“”‘’„`.,:]|$)"""
+    r"|(?<!\w)'(?!(?:re|ve|ll|m|t|s|d|n)\b)(?=\w)"
+    r"|(?<=\bcan)(?=not\b)|(?<=\bgim)(?=me\b)|(?<=\bgon)(?=na\b)|(?<=\bgot)(?=ta\b)|(?<=\blem)(?=me\b)|(?<=\bwan)(?=na\s)"
+)
+
+
+def preprocess_raw_text_fast(text: str, stop_words, lemmatize) -> str:
+    """
+    This function is a faster alternative to preprocess_raw_text, producing the same cleaned text in nearly all cases.
+
+    The text is lowercased once and tokenized with a single compiled regex (FAST_TOKEN_SEPARATORS) instead of word_tokenize,
+    whose sentence splitting is the slowest part. lemmatize is expected to be memoised (see cached_lemmatizer).
+
+    The only differences come from the sentence splitting of word_tokenize, e.g. a word followed by a period that is not
+    the end of a sentence is dropped by word_tokenize ("approx.") but kept here ("approx").
+    """
+    words = FAST_TOKEN_SEPARATORS.sub(r" \g<0> ", text.lower()).split()
+
+    return " ".join(lemmatize(w) for w in words if w.isalpha() and w not in stop_words)
+
+
+def cached_lemmatizer(lemmatizer, cache_size=100_000):
+    """
+    This function memoises the lemmatizer, since the vocabulary is much smaller than the number of tokens.
+    The cache is bounded to cache_size words and shared by all the summaries of a run.
+    """
+    return lru_cache(maxsize=cache_size)(lemmatizer.lemmatize)
+
+
+def make_text_cleaner(text_engine: str, stop_words, lemmatizer):
+    """
+    This function returns the function that cleans one summary with the given text engine:
+    - "nltk": preprocess_raw_text, with word_tokenize
+    - "fast": preprocess_raw_text_fast, with the compiled tokenizer and a memoised lemmatizer
+    """
+    if text_engine == "fast":
+        return partial(preprocess_raw_text_fast, stop_words=stop_words, lemmatize=cached_lemmatizer(lemmatizer))
+
+    if text_engine == "nltk":
+        return partial(preprocess_raw_text, stop_words=stop_words, lemmatizer=lemmatizer)
+
+    raise ValueError(f"Unknown text engine: {text_engine}")
+
+
+def compare_text_engines(summaries: pd.Series, stop_words, lemmatizer) -> pd.DataFrame:
+    """
+    This function cleans the summaries with both text engines and returns the summaries for which the results differ.
+    """
+    nltk_cleaned = summaries.apply(make_text_cleaner("nltk", stop_words, lemmatizer))
+    fast_cleaned = summaries.apply(make_text_cleaner("fast", stop_words, lemmatizer))
+
+    differs = nltk_cleaned != fast_cleaned
+    return pd.DataFrame({"summary": summaries[differs], "nltk": nltk_cleaned[differs], "fast": fast_cleaned[differs]})
+
+
+def check_text_engines(stop_words, lemmatizer):
+    """
+    This function checks that both text engines clean the hand-written edge cases of TEXT_ENGINE_CORPUS identically.
+    It does not need the raw data, and raises an AssertionError listing the summaries that differ.
+    """
+    differences = compare_text_engines(pd.Series(TEXT_ENGINE_CORPUS), stop_words, lemmatizer)
+    if not differences.empty:
+        raise AssertionError(f"The text engines differ on {differences.shape[0]} summaries of the corpus:\n{differences.to_string()}")
+
+
 def sentiment_polarity(text: str) -> str:
     """
     This function calculates the sentiment polarity of the text using TextBlob.
@@ -63,6 +199,129 @@ def sentiment_polarity(text: str) -> str:
     return polarity
 
 
+def lexicon_polarity(text: str) -> float:
+    """
+    This function calculates the sentiment polarity of the text directly from the pattern lexicon used by TextBlob, which is loaded once.
+    It skips the TextBlob object, but tokenizes the text with the pattern tokenizer, exactly as TextBlob's PatternAnalyzer does,
+    so that the lexicon rules (modifiers, negations, "!", emoticons) see the same words and the polarity is the same.
+    The equality is checked with `python preprocess.py --check-sentiment-engine N`.
+    """
+    words = " ".join(pattern_sentiment.tokenizer(text)).split()
+    assessments = pattern_sentiment.assessments(((w.lower(), None) for w in words), negation=True)
+    return sum(p for _, p, _, _ in assessments) / float(len(assessments) or 1)
+
+
+def compare_sentiment_engines(summaries: pd.Series, tolerance=1e-6) -> pd.DataFrame:
+    """
+    This function computes the polarity of the summaries with both sentiment engines and returns the summaries
+    for which the polarities differ by more than the tolerance, with their sentiment category according to each engine.
+    """
+    textblob_polarity = summaries.apply(sentiment_polarity)
+    lexicon_polarities = summaries.apply(lexicon_polarity)
+
+    differs = (textblob_polarity - lexicon_polarities).abs() > tolerance
+    return pd.DataFrame({
+        "summary": summaries[differs],
+        "textblob": textblob_polarity[differs],
+        "lexicon": lexicon_polarities[differs],
+        "same_category": textblob_polarity[differs].apply(categorize_sentiment) == lexicon_polarities[differs].apply(categorize_sentiment),
+    })
+
+
+def make_summary_analyzer(text_engine: str, sentiment_engine: str, stop_words, lemmatizer):
+    """
+    This function returns the function that computes the (sentiment polarity, cleaned text) of one summary.
+
+    The sentiment_engine is either "textblob" (sentiment_polarity) or "lexicon" (lexicon_polarity).
+    """
+    clean_text = make_text_cleaner(text_engine, stop_words, lemmatizer)
+
+    if sentiment_engine == "lexicon":
+        return lambda text: (lexicon_polarity(text), clean_text(text))
+
+    if sentiment_engine == "textblob":
+        return lambda text: (sentiment_polarity(text), clean_text(text))
+
+    raise ValueError(f"Unknown sentiment engine: {sentiment_engine}")
+
+
+@contextmanager
+def timed_stage(timings: dict, stage: str):
+    """
+    This context manager adds the duration of the enclosed stage (in seconds) to the timings.
+    """
+    start = time.perf_counter()
+    yield
+    timings[stage] = timings.get(stage, 0) + time.perf_counter() - start
+
+
+# Summary analyzer of a worker process, initialised once per worker by init_nlp_worker()
+_worker_analyze = None
+
+
+def init_nlp_worker(text_engine="nltk", sentiment_engine="textblob"):
+    """
+    This function initialises the stopwords and the lemmatizer once per worker process,
+    so that they are not pickled and sent along with every chunk of summaries.
+    """
+    global _worker_analyze
+
+    _worker_analyze = make_summary_analyzer(text_engine, sentiment_engine, set(stopwords.words("english")), WordNetLemmatizer())
+
+
+def process_nlp_chunk(summaries: list[str]) -> list[tuple[float, str]]:
+    """
+    This function runs both NLP passes (sentiment polarity and text cleaning) on a chunk of summaries inside a worker process.
+    """
+    return [_worker_analyze(text) for text in summaries]
+
+
+def run_nlp_stage(
+    summaries: pd.Series,
+    stop_words,
+    lemmatizer,
+    n_workers=1,
+    chunk_size=2000,
+    text_engine="nltk",
+    sentiment_engine="textblob",
+) -> tuple[pd.Series, pd.Series]:
+    """
+    This function computes the sentiment polarity and the cleaned text of every summary, with the given engines (see make_summary_analyzer).
+
+    Identical summaries are only analyzed once, then the results are mapped back onto every row.
+
+    With n_workers <= 1, the distinct summaries are analyzed in the current process.
+    Otherwise, they are split into chunks of chunk_size summaries, processed by a pool of n_workers processes
+    and reassembled in their original order, so that the output is identical to the serial path.
+
+    The parallel mode must be started from a script guarded by `if __name__ == "__main__"` (see the bottom of this file).
+    """
+    codes, uniques = pd.factorize(summaries)
+    uniques = list(uniques)
+
+    if n_workers <= 1:
+        analyze = make_summary_analyzer(text_engine, sentiment_engine, stop_words, lemmatizer)
+        results = [analyze(text) for text in uniques]
+    else:
+        chunks = [uniques[i:i + chunk_size] for i in range(0, len(uniques), chunk_size)]
+        results = []
+
+        # executor.map yields the results in the order of the chunks
+        with ProcessPoolExecutor(
+            max_workers=n_workers, initializer=init_nlp_worker, initargs=(text_engine, sentiment_engine)
+        ) as executor:
+            for chunk_results in executor.map(process_nlp_chunk, chunks):
+                results.extend(chunk_results)
+
+    polarities = pd.Series([polarity for polarity, _ in results], dtype=float)
+    cleaned = pd.Series([text for _, text in results], dtype=object)
+
+    polarities = pd.Series(polarities.to_numpy()[codes], index=summaries.index)
+    cleaned = pd.Series(cleaned.to_numpy()[codes], index=summaries.index)
+
+    return polarities, cleaned
+
+
 def categorize_sentiment(s: float, threshold=0.05) -> str:
     """
     This function categorizes the sentiment polarity into three categories: positive, negative, or neutral.
@@ -71,7 +330,9 @@ def categorize_sentiment(s: float, threshold=0.05) -> str:
     return "négatif" if s <= -threshold else "positif" if s >= threshold else "neutre"
 
 
-def preprocess(df: pd.DataFrame) -> pd.DataFrame:
+def preprocess(
+    df: pd.DataFrame, n_workers=1, chunk_size=2000, incremental=False, text_engine="nltk", sentiment_engine="textblob"
+) -> pd.DataFrame:
     """
     This is the main preprocessing function that cleans the data and saves it to a new CSV file.
 
@@ -80,11 +341,21 @@ def preprocess(df: pd.DataFrame) -> pd.DataFrame:
     2. Keep only the columns that are needed
     3. Keep only the rows where the country is USA (and variations of USA)
     4. Cast the date_time column to a format dd-mm-yyyy hh:mm
-    5. Convert the duration (string) to seconds (int) using a custom heuristic
-    6. Convert the shape to lowercase and keep only the primary shapes
+    5. Convert the shape to lowercase and keep only the primary shapes
+    6. Convert the duration (string) to seconds (int) using a custom heuristic
     7. Sentiment analysis on the summary column
-    8. Apply a threshold to the sentiment column, splitting it into three categories    
-    9. Save the processed CSV to assets/data
+    8. Apply a threshold to the sentiment column, splitting it into three categories
+    9. Assign a dense integer id to each city (location, name and state)
+    10. Save the processed CSV, the typed Feather file and the token index of the summaries to assets/data
+
+    The NLP passes (sentiment and summary cleaning) can be distributed over n_workers processes, by chunks of chunk_size summaries.
+    The summaries are cleaned with text_engine, "nltk" (word_tokenize) or "fast" (see preprocess_raw_text_fast),
+    and their polarity is computed with sentiment_engine, "textblob" (sentiment_polarity) or "lexicon" (see lexicon_polarity).
+    The time spent in each stage is printed at the end.
+
+    In incremental mode, the reports whose content hash (see hash_reports) is found in the previous processed data
+    reuse their processed duration, summary and sentiment, and only the new or modified reports go through steps 6 to 8.
+    All the rows are recomputed when the previous data was produced with other settings (engines, preprocessing code or NLP libraries).
     """
 
     # download the stopwords
@@ -92,45 +363,84 @@ def preprocess(df: pd.DataFrame) -> pd.DataFrame:
     stop_words = set(stopwords.words("english"))
 
     # drop the rows with missing values
-    n_rows_original = df.shape[0]
+    # (these steps are no-ops when the rows were already filtered by load_raw_data)
+    n_rows_original = df.attrs.get("n_rows_original", df.shape[0])
     print(f"Original dataset has {n_rows_original} rows")
     df = df.dropna()
 
-    percent = df.shape[0] / n_rows_original * 100
-    print(f"After dropping missing values, there are {df.shape[0]} rows ({percent:.2f}% of original)")
+    n_rows_complete = df.attrs.get("n_rows_complete", df.shape[0])
+    percent = n_rows_complete / n_rows_original * 100
+    print(f"After dropping missing values, there are {n_rows_complete} rows ({percent:.2f}% of original)")
 
     #  keep the columns that are needed
-    columns_to_keep = ["summary", "country", "city", "state", "date_time", "shape", "duration", "city_latitude","city_longitude"]
-    df = df[columns_to_keep]
+    df = df[COLUMNS_TO_KEEP]
 
     # Keep only the rows where the country is USA (and variations of USA)
-    usa_name_variants = ["USA", "usa", "USAv", "Usa", "USAUSA", "U", "Untied States of America"]
-    df = df[df["country"].isin(usa_name_variants)]
+    df = df[df["country"].isin(USA_NAME_VARIANTS)]
     df = df.drop("country", axis=1)
     
     percent = df.shape[0] / n_rows_original * 100
     print(f"After keeping only USA, there are {df.shape[0]} rows ({percent:.2f}% of original)")
 
-    # Cast the date_time column to a format dd-mm-yyyy hh:mm
-    df["date_time"] = pd.to_datetime(df["date_time"], errors="coerce")
+    timings = {}
+    settings = preprocessing_settings(text_engine, sentiment_engine)
 
-    # Convert the duration (string) to seconds (int)
-    df["duration"] = df["duration"].apply(lambda x: convert_to_seconds(x))
-    df = df.dropna(subset=["duration"])
-    
-    percent = df.shape[0] / n_rows_original * 100
-    print(f"After converting the duration to seconds, there are {df.shape[0]} rows ({percent:.2f}% of original)")
+    with timed_stage(timings, "dates and shapes"):
+        # Hash the raw content of each report, before any of the hashed columns is transformed
+        df["row_hash"] = hash_reports(df)
+
+        # Cast the date_time column to a format dd-mm-yyyy hh:mm
+        df["date_time"] = pd.to_datetime(df["date_time"], errors="coerce")
+
+        # Convert the shape to lowercase and keep only the primary shapes
+        primary_shapes = ["light", "circle", "triangle", "fireball"]
+        df["shape"] = df["shape"].apply(lambda x: x.lower())
+        df["shape"] = df["shape"].apply(lambda x: x if x in primary_shapes else "other")
+
+    # Incremental mode: set aside the reports that were already processed by the previous run
+    reused_df = df.iloc[0:0]
+    raw_durations = df["duration"]
+
+    with timed_stage(timings, "previous rows"):
+        previous_rows = load_previous_rows(settings) if incremental else None
+
+        if previous_rows is not None:
+            is_reused = df["row_hash"].isin(previous_rows.index)
+            reused_df = df[is_reused].copy()
+            df = df[~is_reused]
 
-    # Convert the shape to lowercase and keep only the primary shapes
-    primary_shapes = ["light", "circle", "triangle", "fireball"]
-    df["shape"] = df["shape"].apply(lambda x: x.lower())
-    df["shape"] = df["shape"].apply(lambda x: x if x in primary_shapes else "other")
+            processed = previous_rows.loc[reused_df["row_hash"]]
+            for column in processed.columns:
+                reused_df[column] = processed[column].to_numpy()
+
+    with timed_stage(timings, "durations"):
+        # Convert the duration (string) to seconds (int), once per distinct duration string
+        seconds = convert_durations(df["duration"])
+
+        # The coverage is reported on the whole column: the reused rows all had a converted duration
+        raw_durations = pd.concat([raw_durations[reused_df.index], df["duration"]])
+        all_seconds = pd.concat([reused_df["duration"].astype(float), seconds])
+        print_duration_coverage(duration_coverage_report(raw_durations, all_seconds))
+
+        df["duration"] = seconds
+        df = df.dropna(subset=["duration"])
+
+    # Rows that go through the NLP stage (new or modified reports with a converted duration)
+    n_rows_analyzed = df.shape[0]
 
     # ============== Sentiment analysis ==============
     # Remove all stop words from the summary column
-    lemmatizer = WordNetLemmatizer()
-    df["sentiment"] = df["summary"].apply(sentiment_polarity)
-    df["summary"] = df["summary"].apply(preprocess_raw_text, stop_words=stop_words, lemmatizer=lemmatizer)
+    with timed_stage(timings, "sentiment and text cleaning"):
+        lemmatizer = WordNetLemmatizer()
+        df["sentiment"], df["summary"] = run_nlp_stage(
+            df["summary"],
+            stop_words,
+            lemmatizer,
+            n_workers=n_workers,
+            chunk_size=chunk_size,
+            text_engine=text_engine,
+            sentiment_engine=sentiment_engine,
+        )
 
     # Apply a threshold to the sentiment column, splitting it into three categories
     # [-1, -T] -> "negative"
@@ -138,16 +448,84 @@ def preprocess(df: pd.DataFrame) -> pd.DataFrame:
     # (+T, 1] -> "positive"
     df["sentiment"] = df["sentiment"].apply(lambda x: categorize_sentiment(x))
 
-    # Save the processed CSV to assets/data
-    if os.path.exists("assets/data/processed_data.csv"):
-        os.remove("assets/data/processed_data.csv")
+    if previous_rows is not None:
+        df = pd.concat([reused_df, df]).sort_index()
+        df["duration"] = df["duration"].astype(float)
+
+        print(f"Incremental mode: {reused_df.shape[0]} rows reused from the previous run, {n_rows_analyzed} rows analyzed")
+
+    percent = df.shape[0] / n_rows_original * 100
+    print(f"After converting the duration to seconds, there are {df.shape[0]} rows ({percent:.2f}% of original)")
 
-    df.to_csv("assets/data/processed_data.csv", quoting=csv.QUOTE_NONNUMERIC)
-    print(">>> Data has been processed and saved to assets/data/processed_data.csv")
+    # Dense integer id of each city (location, name and state), used by the map instead of grouping the city columns
+    df["city_id"] = assign_city_ids(df)
+
+    # Save the processed CSV, the typed Feather file and the token index of the summaries to assets/data
+    with timed_stage(timings, "save"):
+        save_processed_data(df, settings)
+
+    print(">>> Time spent per stage:")
+    for stage, seconds in timings.items():
+        print(f"    {stage:<30} {seconds:>8.2f} s")
 
     return df
 
 
+def hash_reports(df: pd.DataFrame) -> pd.Series:
+    """
+    This function hashes the raw content of each report (summary, date_time, city and duration) into a 64-bit integer.
+    """
+    return pd.util.hash_pandas_object(df[["summary", "date_time", "city", "duration"]], index=False)
+
+
+def preprocessing_settings(text_engine: str, sentiment_engine: str) -> dict:
+    """
+    This function returns the settings that produce the processed duration, summary and sentiment of the reports:
+    the engines, the versions of the NLP libraries and the hash of the preprocessing code and constants.
+    """
+    code_hash = hashlib.sha256()
+    for path in PREPROCESSING_SOURCE_FILES:
+        with open(path, "rb") as file:
+            code_hash.update(file.read())
+
+    return {
+        "text_engine": text_engine,
+        "sentiment_engine": sentiment_engine,
+        "libraries": {library: importlib.metadata.version(library) for library in PREPROCESSING_LIBRARIES},
+        "code_hash": code_hash.hexdigest(),
+    }
+
+
+def load_previous_rows(settings: dict) -> pd.DataFrame:
+    """
+    This function loads the processed duration, summary and sentiment of the previous run, indexed by the hash of the raw reports.
+
+    None is returned when there is no previous processed data, when it was produced before the reports were hashed,
+    or when it was produced with other settings than the current run (see preprocessing_settings).
+    """
+    if not os.path.exists(PROCESSED_FEATHER_PATH) and not os.path.exists(PROCESSED_CSV_PATH):
+        print(">>> No previous processed data, all rows will be computed")
+        return None
+
+    previous_settings = None
+    if os.path.exists(PROCESSED_SETTINGS_PATH):
+        with open(PROCESSED_SETTINGS_PATH) as file:
+            previous_settings = json.load(file)
+
+    if previous_settings != settings:
+        print(">>> The previous processed data was produced with other settings (engines, preprocessing code or NLP libraries), all rows will be computed")
+        return None
+
+    previous_df = load_data()
+
+    if "row_hash" not in previous_df:
+        print(">>> The previous processed data has no row hashes, all rows will be computed")
+        return None
+
+    previous_df = previous_df.drop_duplicates("row_hash").set_index("row_hash")
+    return previous_df[["duration", "summary", "sentiment"]]
+
+
 def convert_to_seconds(duration) -> float:
     """
     This function converts a duration string to seconds.
@@ -223,44 +601,119 @@ def convert_to_seconds(duration) -> float:
         return None
 
 
-def filter_by_shapes(df: pd.DataFrame, shapes: list[str]) -> pd.DataFrame:
-
-    # Keys: subset of "light", "circle", "triangle", "fireball", "other"
-
-    if not shapes:
-        return df
+def convert_durations(durations: pd.Series) -> pd.Series:
+    """
+    This function is the vectorized equivalent of convert_to_seconds, applied to a whole column of duration strings.
 
-    return df[df["shape"].isin(shapes)]
+    The heuristic is only evaluated once per distinct string (the same durations, e.g. "5 minutes", are repeated many times),
+    with pandas string operations on the tokens of all distinct strings at once. The result is then mapped back onto the column.
 
+    The results are identical to convert_to_seconds, including the averaging of the X-Y ranges.
+    """
+    codes, uniques = pd.factorize(durations)
 
-def filter_by_duration(df: pd.DataFrame, duration: str = "all"):
+    # Same cleaning as convert_to_seconds: lowercase, keep only alphanumeric characters, spaces and "-"
+    normalized = pd.Series(uniques, dtype=object).str.lower().str.replace(r"[^\w\s-]|_", "", regex=True)
 
-    # Keys : "short" OR "long" OR "all"
+    # One row per token, the index being the position of the distinct string it comes from
+    tokens = normalized.str.split().explode().dropna()
 
-    if duration == "all":
-        return df
+    # Only the strings containing at least one time keyword can be converted
+    has_keyword = tokens.isin(TIME_KEYWORDS.keys()).groupby(level=0).any()
+    tokens = tokens[has_keyword.reindex(tokens.index).to_numpy()]
+    tokens = tokens.map(TIME_KEYWORDS).fillna(tokens)
 
-    if duration == "short":
-        return df[df["duration"] < 60]
+    # Replace the X-Y ranges, where X and Y are numbers, by their mean
+    ranges = tokens.str.extract(r"^([^-]*)-([^-]*)$").fillna("")
+    is_range = (ranges[0].str.isnumeric() & ranges[1].str.isnumeric()).to_numpy()
+    ranges = ranges[is_range]
+    means = (ranges[0].map(int) + ranges[1].map(int)) / 2
+    tokens[is_range] = means.map(lambda x: str(int(x))).to_numpy()
 
-    if duration == "long":
-        return df[df["duration"] >= 60]
+    # Keep the numbers and the time units, then sum each number followed by a unit
+    tokens = tokens[(tokens.str.isnumeric() | tokens.isin(TIME_VALUES.keys())).to_numpy()]
+    next_tokens = tokens.groupby(level=0).shift(-1)
+    is_pair = (tokens.str.isnumeric() & next_tokens.isin(TIME_VALUES.keys())).to_numpy()
 
-    return df
+    values = tokens[is_pair]
+    units = next_tokens[is_pair]
+    numbers = values.map({value: 2 if value == "2½" else int(value) for value in values.unique()})
+    pair_seconds = numbers * units.map(TIME_VALUES)
 
+    total_seconds = pair_seconds.groupby(level=0).sum()
+    total_seconds = total_seconds[total_seconds > 0].reindex(range(len(uniques)))
 
-def filter_by_decade(df: pd.DataFrame, decade: str = "Toutes") -> pd.DataFrame:
+    seconds = total_seconds.to_numpy(dtype=float)[codes]
+    seconds[codes == -1] = float("nan")
 
-    # Keys : "Pre-1980" OR "1980" OR "1990" OR "2000" OR "2010" OR "Toutes"
+    return pd.Series(seconds, index=durations.index, name=durations.name)
 
-    if decade == "Toutes":
-        return df
 
-    if decade == "Pre-1980":
-        return df[df["date_time"].dt.year < 1980]
+def duration_coverage_report(durations: pd.Series, seconds: pd.Series, top_n=15) -> pd.DataFrame:
+    """
+    This function lists the most frequent patterns among the durations that could not be converted to seconds.
 
-    min_year = int(decade)
-    max_year = min_year + 9
-    return df[
-        (df["date_time"].dt.year >= min_year) & (df["date_time"].dt.year <= max_year)
-    ]
\ No newline at end of file
+    Numbers are replaced by "N" so that e.g. "5:00" and "10:00" are counted as the same pattern "N:N".
+    The share of converted durations is stored in the attrs of the report.
+    """
+    unparsed = durations[seconds.isna()]
+    patterns = unparsed.str.lower().str.strip().str.replace(r"\d+", "N", regex=True)
+
+    report = patterns.value_counts().head(top_n).rename_axis("pattern").reset_index(name="count")
+    report["percent"] = report["count"] / len(durations) * 100
+    report.attrs["parsed_percent"] = (1 - len(unparsed) / max(len(durations), 1)) * 100
+
+    return report
+
+
+def print_duration_coverage(report: pd.DataFrame):
+    print(f"{report.attrs['parsed_percent']:.2f}% of the durations were converted to seconds, most frequent unparsed patterns:")
+    for pattern, count, percent in report.itertuples(index=False):
+        print(f"    {pattern:<30} {count:>8} ({percent:.2f}%)")
+
+
+if __name__ == "__main__":
+    # Rebuild the processed data from the command line (from the /src directory), e.g.:
+    #   python preprocess.py --workers 8 --chunk-size 2000
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Preprocess the raw NUFORC reports")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="number of processes for the NLP stage")
+    parser.add_argument("--chunk-size", type=int, default=2000, help="number of summaries per chunk sent to a worker")
+    parser.add_argument("--incremental", action="store_true", help="reuse the rows of the previous processed data that did not change")
+    parser.add_argument("--text-engine", choices=["nltk", "fast"], default="nltk", help="tokenizer used to clean the summaries")
+    parser.add_argument("--sentiment-engine", choices=["textblob", "lexicon"], default="textblob", help="sentiment polarity implementation")
+    parser.add_argument("--check-text-engine", type=int, metavar="N", help="only compare both text engines on N random summaries")
+    parser.add_argument("--check-text-engine-corpus", action="store_true", help="only check both text engines on the edge-case corpus")
+    parser.add_argument("--check-sentiment-engine", type=int, metavar="N", help="only compare both sentiment engines on N random summaries")
+    args = parser.parse_args()
+
+    if args.check_text_engine:
+        nltk.download("stopwords")
+        sample = load_raw_data()["summary"].sample(args.check_text_engine, random_state=0)
+        differences = compare_text_engines(sample, set(stopwords.words("english")), WordNetLemmatizer())
+
+        percent = (1 - differences.shape[0] / sample.shape[0]) * 100
+        print(f"{percent:.2f}% of the {sample.shape[0]} summaries are cleaned identically by both text engines")
+        print(differences.head(10).to_string())
+    elif args.check_text_engine_corpus:
+        nltk.download("stopwords")
+        check_text_engines(set(stopwords.words("english")), WordNetLemmatizer())
+        print(f">>> Both text engines clean the {len(TEXT_ENGINE_CORPUS)} summaries of the corpus identically")
+    elif args.check_sentiment_engine:
+        sample = load_raw_data()["summary"].sample(args.check_sentiment_engine, random_state=0)
+        differences = compare_sentiment_engines(sample)
+
+        percent = (1 - differences.shape[0] / sample.shape[0]) * 100
+        same_category = (1 - (~differences["same_category"]).sum() / sample.shape[0]) * 100
+        print(f"{percent:.2f}% of the {sample.shape[0]} polarities are equal within 1e-6, {same_category:.2f}% have the same category")
+        print(differences.head(10).to_string())
+    else:
+        preprocess(
+            load_raw_data(),
+            n_workers=args.workers,
+            chunk_size=args.chunk_size,
+            incremental=args.incremental,
+            text_engine=args.text_engine,
+            sentiment_engine=args.sentiment_engine,
+        )
@@ -37,4 +37,48 @@ TIME_VALUES = {
     "w": 7 * 24 * 60 * 60,
     "mo": 30 * 24 * 60 * 60,
     "y": 365 * 24 * 60 * 60,
-}
\ No newline at end of file
+}
+
+# Columns of the raw NUFORC reports that are used by the application
+COLUMNS_TO_KEEP = [
+    "summary",
+    "country",
+    "city",
+    "state",
+    "date_time",
+    "shape",
+    "duration",
+    "city_latitude",
+    "city_longitude",
+]
+
+# Spellings of the USA found in the country column of the raw reports
+USA_NAME_VARIANTS = ["USA", "usa", "USAv", "Usa", "USAUSA", "U", "Untied States of America"]
+
+# Hand-written summaries with the punctuation, contractions and abbreviations that the fast text engine must tokenize like word_tokenize
+# (see preprocess.check_text_engines)
+TEXT_ENGINE_CORPUS = [
+    "I saw a bright light at approx. 9:30pm, it wasn't moving.",
+    "We couldn't believe it...it was HUGE!!",
+    "\"Strange\" lights (three) over the lake; gone in 5-10 sec.",
+    "My wife's car & the neighbors' dog barked.",
+    "It was 1,000 ft up, about 3:00 a.m. Then it vanished.",
+    "Cannot explain, gonna report it. Wanna know more.",
+    "Object--very fast--moved N/NE at 200mph",
+    "Lights: red, green, blue.Flashing constantly",
+    "'Tis odd. He said 'wow' and ran.",
+    "I'm sure they'll see it; we've seen it ’twice’ don’t laugh",
+    "U.S. Air Force? No. (NUFORC Note: Witness elects to remain totally anonymous.  PD)",
+    "Orb-like object, e.g. a sphere... ~50 ft.",
+    "((NUFORC Note:  Possible star?  PD))",
+    "It's 2am.I woke up",
+    "a 'b' c'd e'",
+    "Two objects. Mr. Smith saw them too.",
+    "The sky!!!Then nothing",
+    "ok , well:great",
+    "at 12:45 p.m. we saw it",
+    "It was a great--really great--sight",
+    "bright light...then it was beautiful",
+    "very,very bright",
+    "",
+]
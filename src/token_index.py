@@ -0,0 +1,119 @@
+# This file contains the token index of the summaries, used by the word frequency graph.
+# The preprocessing splits each cleaned summary into words once, and saves the vocabulary and, for each observation, the ids of its distinct words
+# with their number of occurrences, in compressed sparse row (CSR) form. The top words of a selection of observations are then the sums
+# of the counts of the selected rows, without joining or splitting the summaries at request time.
+
+import os
+
+import numpy as np
+import pandas as pd
+
+import data_access
+
+TOKEN_INDEX_PATH = "assets/data/processed_tokens.npz"
+
+
+class TokenIndex:
+    """
+    This class holds the words of the summaries in CSR form: the word ids of the observation i are token_ids[indptr[i]:indptr[i + 1]],
+    with their number of occurrences in the summary in token_counts. The words of each observation are in the order of their first occurrence
+    in the summary, and the word ids (positions in the vocabulary) follow the order of the first occurrence of the words in all the summaries.
+    """
+
+    def __init__(self, vocabulary: np.ndarray, indptr: np.ndarray, token_ids: np.ndarray, token_counts: np.ndarray):
+        self.vocabulary = vocabulary
+        self.indptr = indptr
+        self.token_ids = token_ids
+        self.token_counts = token_counts
+        # Observation of each (observation, word) entry, so that a mask of the observations selects the entries
+        self.entry_rows = np.repeat(np.arange(len(indptr) - 1, dtype=np.int32), np.diff(indptr))
+
+    def __len__(self) -> int:
+        return len(self.indptr) - 1
+
+    def top_words(self, mask: np.ndarray, n_words: int = 10) -> pd.DataFrame:
+        """
+        This method returns the n_words most common words (columns "Word" and "Count") of the summaries of the observations selected by the mask,
+        the same as Counter(" ".join(summaries).lower().split()).most_common(n_words): the ties are in the order of first occurrence.
+        """
+        selected = mask[self.entry_rows]
+        token_ids = self.token_ids[selected]
+        counts = np.bincount(token_ids, weights=self.token_counts[selected], minlength=len(self.vocabulary)).astype(np.int64)
+
+        n_words = min(n_words, np.count_nonzero(counts))
+        if n_words == 0:
+            return pd.DataFrame({"Word": pd.Series(dtype=str), "Count": pd.Series(dtype=np.int64)})
+
+        # Candidates: the words counted at least as many times as the n-th most common word (partial selection, the vocabulary is not sorted)
+        threshold = counts[np.argpartition(-counts, n_words - 1)[n_words - 1]]
+        candidates = np.flatnonzero(counts >= threshold)
+
+        # The candidates are sorted by count, then by their first occurrence in the selected summaries (first entry of the word),
+        # which is only looked up when some candidates have the same count
+        if len(np.unique(counts[candidates])) == len(candidates):
+            top = candidates[np.argsort(-counts[candidates])[:n_words]]
+        else:
+            is_candidate = np.isin(token_ids, candidates)
+            candidates, first_entries = np.unique(token_ids[is_candidate], return_index=True)
+            top = candidates[np.lexsort((first_entries, -counts[candidates]))[:n_words]]
+
+        return pd.DataFrame({"Word": self.vocabulary[top], "Count": counts[top]})
+
+    def save(self, path: str = TOKEN_INDEX_PATH):
+        """
+        This method saves the arrays of the index to an uncompressed npz file.
+        """
+        np.savez(path, vocabulary=self.vocabulary, indptr=self.indptr, token_ids=self.token_ids, token_counts=self.token_counts)
+
+
+def build_token_index(summaries: pd.Series) -> TokenIndex:
+    """
+    This function splits the summaries into words (lowercase, separated by whitespace, like the word frequency graph did at request time)
+    and returns their token index.
+    """
+    words_by_row = [summary.lower().split() for summary in summaries.fillna("").astype(str)]
+    lengths = np.array([len(words) for words in words_by_row], dtype=np.int64)
+    word_ids, vocabulary = pd.factorize(pd.Series([word for words in words_by_row for word in words], dtype=object))
+
+    # One entry per (observation, word), at the first position of the word in the summary
+    n_keys = max(len(vocabulary), 1)
+    rows = np.repeat(np.arange(len(words_by_row), dtype=np.int64), lengths)
+    keys, first_positions, token_counts = np.unique(rows * n_keys + word_ids, return_index=True, return_counts=True)
+    order = np.argsort(first_positions, kind="stable")
+    keys = keys[order]
+
+    indptr = np.zeros(len(words_by_row) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(keys // n_keys, minlength=len(words_by_row)), out=indptr[1:])
+
+    return TokenIndex(
+        np.asarray(vocabulary, dtype=str),
+        indptr,
+        (keys % n_keys).astype(np.int32),
+        token_counts[order].astype(np.int32),
+    )
+
+
+def is_token_index_fresh(path: str = TOKEN_INDEX_PATH) -> bool:
+    """
+    This function checks that the token index exists and is not older than the processed data files.
+    """
+    if not os.path.exists(path):
+        return False
+
+    data_paths = [data_path for data_path in (data_access.PROCESSED_FEATHER_PATH, data_access.PROCESSED_CSV_PATH) if os.path.exists(data_path)]
+    return all(os.path.getmtime(path) >= os.path.getmtime(data_path) for data_path in data_paths)
+
+
+def load_token_index(df: pd.DataFrame) -> TokenIndex:
+    """
+    This function loads the token index saved by the preprocessing, or builds it from the summaries when it is missing or out of date.
+    """
+    if is_token_index_fresh():
+        with np.load(TOKEN_INDEX_PATH) as arrays:
+            index = TokenIndex(arrays["vocabulary"], arrays["indptr"], arrays["token_ids"], arrays["token_counts"])
+
+        if len(index) == len(df):
+            return index
+
+    print(f">>> {TOKEN_INDEX_PATH} is missing or out of date, building the token index of the summaries")
+    return build_token_index(df["summary"])